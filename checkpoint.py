@@ -0,0 +1,97 @@
+import datetime
+import json
+import os
+import re
+import shutil
+import time
+
+# Local state shared by all leagues (cached between GitHub Actions runs)
+STATE_DIR = os.getenv('STATE_DIR', '.state')
+CHECKPOINT_DIR = os.path.join(STATE_DIR, 'checkpoints')
+
+# Checkpoint directories older than this are removed at the start of a run
+KEEP_DAYS = 7
+
+# Callables notified as listener(league, stage, seconds, skipped) after every stage
+STAGE_LISTENERS = []
+
+class RunCheckpoint:
+    """
+    Persist each stage's output for one league's run so a rerun can resume.
+
+    Stages are stored as JSON files under CHECKPOINT_DIR/<league>/<run_date>/.
+    A stage that already has a file is skipped and its saved output returned,
+    so a run that failed on its last Sheets write only redoes that write.
+    """
+
+    def __init__(self, league, run_date=None, base_dir=None):
+        """
+        Args:
+            league (str): League key, e.g. "mlb" or "nba"
+            run_date (str, optional): Date in YYYY-MM-DD format. Defaults to today.
+            base_dir (str, optional): Root checkpoint directory. Defaults to CHECKPOINT_DIR.
+        """
+        self.league = league
+        self.run_date = run_date or datetime.date.today().strftime('%Y-%m-%d')
+        self.league_dir = os.path.join(base_dir or CHECKPOINT_DIR, league)
+        self.directory = os.path.join(self.league_dir, self.run_date)
+        self.timings = {}
+
+    def _stage_path(self, stage):
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]+', '_', stage)
+        return os.path.join(self.directory, f"{safe_name}.json")
+
+    def is_complete(self, stage):
+        return os.path.exists(self._stage_path(stage))
+
+    def load(self, stage):
+        with open(self._stage_path(stage)) as f:
+            return json.load(f)['output']
+
+    def save(self, stage, output):
+        """Write the stage output atomically so a crash never leaves a half-written checkpoint."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._stage_path(stage)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'stage': stage, 'completed_at': datetime.datetime.now().isoformat(timespec='seconds'),
+                       'output': output}, f)
+        os.replace(tmp_path, path)
+
+    def run_stage(self, stage, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) unless the stage is already checkpointed.
+
+        Returns:
+            The stage output, either freshly computed or loaded from the checkpoint.
+            Outputs round-trip through JSON, so dict keys come back as strings.
+        """
+        if self.is_complete(stage):
+            print(f"Skipping {self.league.upper()} stage '{stage}' (checkpointed for {self.run_date}).")
+            self.timings[stage] = 0.0
+            self._notify(stage, 0.0, True)
+            return self.load(stage)
+
+        start = time.perf_counter()
+        output = func(*args, **kwargs)
+        self.timings[stage] = time.perf_counter() - start
+        self.save(stage, output)
+        self._notify(stage, self.timings[stage], False)
+        return output
+
+    def _notify(self, stage, seconds, skipped):
+        for listener in STAGE_LISTENERS:
+            listener(self.league, stage, seconds, skipped)
+
+    def clear(self):
+        """Forget every stage of this run."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def prune(self, keep_days=KEEP_DAYS):
+        """Remove this league's checkpoint directories older than keep_days."""
+        if not os.path.isdir(self.league_dir):
+            return
+        cutoff = (datetime.date.today() - datetime.timedelta(days=keep_days)).strftime('%Y-%m-%d')
+        for name in os.listdir(self.league_dir):
+            if name < cutoff:
+                shutil.rmtree(os.path.join(self.league_dir, name), ignore_errors=True)
@@ -0,0 +1,470 @@
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Grid size of tabs created without explicit gridProperties, as in Google Sheets
+DEFAULT_ROW_COUNT = 1000
+DEFAULT_COLUMN_COUNT = 26
+
+_CELL_RE = re.compile(r'^([A-Za-z]*)(\d*)$')
+
+def _column_number(letters):
+    number = 0
+    for letter in letters.upper():
+        number = number * 26 + ord(letter) - ord('A') + 1
+    return number
+
+def _column_letters(number):
+    letters = ''
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def _parse_cell(ref):
+    """'B7' -> (7, 2), 'F' -> (None, 6), '3' -> (3, None)."""
+    match = _CELL_RE.match(ref)
+    if not match or not ref:
+        return None
+    letters, digits = match.groups()
+    return (int(digits) if digits else None), (_column_number(letters) if letters else None)
+
+class APIError(Exception):
+    """Error returned to the client in the Sheets API JSON error format."""
+
+    def __init__(self, code, status, message):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+        self.message = message
+
+class _Tab:
+    def __init__(self, properties):
+        grid = properties.setdefault('gridProperties', {})
+        grid.setdefault('rowCount', DEFAULT_ROW_COUNT)
+        grid.setdefault('columnCount', DEFAULT_COLUMN_COUNT)
+        self.properties = properties
+        self.cells = {}
+
+    @property
+    def grid(self):
+        return self.properties['gridProperties']
+
+    def max_row(self):
+        return max((row for row, _ in self.cells), default=0)
+
+    def max_column(self):
+        return max((column for _, column in self.cells), default=0)
+
+    def read(self, r1, c1, r2, c2):
+        r2 = r2 or self.max_row()
+        c2 = c2 or self.max_column()
+        rows = []
+        for row in range(r1, r2 + 1):
+            values = [self.cells.get((row, column), '') for column in range(c1, c2 + 1)]
+            while values and values[-1] == '':
+                values.pop()
+            rows.append(values)
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def write(self, r1, c1, rows):
+        for row_offset, values in enumerate(rows):
+            for column_offset, value in enumerate(values):
+                key = (r1 + row_offset, c1 + column_offset)
+                if value in ('', None):
+                    self.cells.pop(key, None)
+                else:
+                    if isinstance(value, float) and value.is_integer():
+                        value = int(value)
+                    self.cells[key] = value if isinstance(value, str) else json.dumps(value)
+        self.grid['rowCount'] = max(self.grid['rowCount'], r1 + len(rows) - 1)
+
+    def shift_rows(self, start_row, count, c1=1, c2=None):
+        """Move every cell on or below start_row (within columns c1..c2) down by count rows."""
+        moved = {}
+        for (row, column), value in list(self.cells.items()):
+            if row >= start_row and column >= c1 and (c2 is None or column <= c2):
+                del self.cells[(row, column)]
+                moved[(row + count, column)] = value
+        self.cells.update(moved)
+        self.grid['rowCount'] += count
+
+    def delete_rows(self, start_row, count):
+        """Remove count rows from start_row and move every row below them up."""
+        moved = {}
+        for (row, column), value in list(self.cells.items()):
+            if row >= start_row:
+                del self.cells[(row, column)]
+                if row >= start_row + count:
+                    moved[(row - count, column)] = value
+        self.cells.update(moved)
+        self.grid['rowCount'] -= count
+
+    def clear(self, r1, c1, r2, c2):
+        for row, column in list(self.cells):
+            if r1 <= row <= r2 and c1 <= column <= c2:
+                del self.cells[(row, column)]
+
+class FakeSpreadsheet:
+    """In-memory spreadsheet holding tabs of string cell values."""
+
+    def __init__(self, spreadsheet_id, title, tabs):
+        self.id = spreadsheet_id
+        self.title = title
+        self.tabs = []
+        self.developer_metadata = []
+        for properties in tabs:
+            self.add_tab(dict(properties))
+
+    def add_tab(self, properties):
+        if any(tab.properties['title'] == properties['title'] for tab in self.tabs):
+            raise APIError(400, 'INVALID_ARGUMENT',
+                           f"Invalid requests[0].addSheet: A sheet with the name \"{properties['title']}\" already exists.")
+        properties.setdefault('sheetId', max((tab.properties['sheetId'] for tab in self.tabs), default=-1) + 1)
+        properties.setdefault('index', len(self.tabs))
+        properties.setdefault('sheetType', 'GRID')
+        tab = _Tab(properties)
+        self.tabs.append(tab)
+        return tab
+
+    def tab_by_id(self, sheet_id):
+        tab = next((tab for tab in self.tabs if tab.properties['sheetId'] == int(sheet_id)), None)
+        if tab is None:
+            raise APIError(400, 'INVALID_ARGUMENT', f"No grid with id: {sheet_id}")
+        return tab
+
+    def tab_by_title(self, title):
+        tab = next((tab for tab in self.tabs if tab.properties['title'] == title), None)
+        if tab is None:
+            raise APIError(400, 'INVALID_ARGUMENT', f"Unable to parse range: {title}")
+        return tab
+
+    def parse_range(self, a1):
+        """Return (tab, r1, c1, r2, c2) for an A1 range; open ends come back as None."""
+        if '!' in a1:
+            title, cells = a1.rsplit('!', 1)
+            if title.startswith("'") and title.endswith("'"):
+                title = title[1:-1].replace("''", "'")
+        elif _parse_cell(a1.partition(':')[0]) is None:
+            title, cells = a1, ''
+        else:
+            title, cells = self.tabs[0].properties['title'], a1
+        tab = self.tab_by_title(title)
+        if not cells:
+            return tab, 1, 1, None, None
+
+        start, _, end = cells.partition(':')
+        first, last = _parse_cell(start), _parse_cell(end or start)
+        if first is None or last is None:
+            raise APIError(400, 'INVALID_ARGUMENT', f"Unable to parse range: {a1}")
+        return tab, first[0] or 1, first[1] or 1, last[0], last[1]
+
+    def metadata(self):
+        return {
+            'spreadsheetId': self.id,
+            'properties': {'title': self.title, 'locale': 'en_US', 'timeZone': 'Etc/GMT'},
+            'sheets': [{'properties': tab.properties} for tab in self.tabs],
+        }
+
+    def search_developer_metadata(self, data_filters):
+        """Match developer metadata by key, value or id, like developerMetadata.search."""
+        matched = [{'developerMetadata': metadata, 'dataFilters': [data_filter]}
+                   for data_filter in data_filters for metadata in self._matching_metadata(data_filter)]
+        return {'matchedDeveloperMetadata': matched} if matched else {}
+
+    def _matching_metadata(self, data_filter):
+        lookup = data_filter.get('developerMetadataLookup')
+        if lookup is None:
+            raise APIError(400, 'INVALID_ARGUMENT', "Fake Sheets only matches by developerMetadataLookup")
+        return [metadata for metadata in self.developer_metadata
+                if all(metadata.get(field) == lookup[field]
+                       for field in ('metadataKey', 'metadataValue', 'metadataId') if field in lookup)]
+
+    def _range_name(self, tab, r1, c1, r2, c2):
+        end = f"{_column_letters(c2 or max(tab.max_column(), c1))}{r2 or max(tab.max_row(), r1)}"
+        return f"'{tab.properties['title']}'!{_column_letters(c1)}{r1}:{end}"
+
+    def values_get(self, a1):
+        tab, r1, c1, r2, c2 = self.parse_range(a1)
+        response = {'range': self._range_name(tab, r1, c1, r2, c2), 'majorDimension': 'ROWS'}
+        values = tab.read(r1, c1, r2, c2)
+        if values:
+            response['values'] = values
+        return response
+
+    def values_update(self, a1, values):
+        tab, r1, c1, _, _ = self.parse_range(a1)
+        tab.write(r1, c1, values)
+        return {
+            'spreadsheetId': self.id,
+            'updatedRange': a1,
+            'updatedRows': len(values),
+            'updatedColumns': max((len(row) for row in values), default=0),
+            'updatedCells': sum(len(row) for row in values),
+        }
+
+    def batch_update(self, requests):
+        """Apply the structural requests this repo sends, in order, and return their replies."""
+        replies = []
+        for request in requests:
+            (kind, body), = request.items()
+            handler = getattr(self, f"_request_{kind}", None)
+            if handler is None:
+                raise APIError(400, 'INVALID_ARGUMENT', f"Fake Sheets does not implement '{kind}' requests")
+            replies.append(handler(body) or {})
+        return {'spreadsheetId': self.id, 'replies': replies}
+
+    def _grid_range(self, grid_range):
+        tab = self.tab_by_id(grid_range['sheetId'])
+        r1 = grid_range.get('startRowIndex', 0) + 1
+        c1 = grid_range.get('startColumnIndex', 0) + 1
+        r2 = grid_range.get('endRowIndex', tab.grid['rowCount'])
+        c2 = grid_range.get('endColumnIndex', tab.grid['columnCount'])
+        return tab, r1, c1, r2, c2
+
+    def _request_addSheet(self, body):
+        tab = self.add_tab(json.loads(json.dumps(body.get('properties', {}))))
+        return {'addSheet': {'properties': tab.properties}}
+
+    def _request_insertRange(self, body):
+        tab, r1, c1, r2, c2 = self._grid_range(body['range'])
+        tab.shift_rows(r1, r2 - r1 + 1, c1, c2)
+
+    def _request_insertDimension(self, body):
+        grid_range = body['range']
+        tab = self.tab_by_id(grid_range['sheetId'])
+        if grid_range['dimension'] != 'ROWS':
+            raise APIError(400, 'INVALID_ARGUMENT', "Fake Sheets only inserts ROWS")
+        count = grid_range['endIndex'] - grid_range['startIndex']
+        tab.shift_rows(grid_range['startIndex'] + 1, count)
+        # Row metadata moves with its rows, and grows when rows are inserted inside it
+        for metadata in self.developer_metadata:
+            rows = metadata['location']['dimensionRange']
+            if rows['sheetId'] != tab.properties['sheetId']:
+                continue
+            if rows['startIndex'] >= grid_range['startIndex']:
+                rows['startIndex'] += count
+                rows['endIndex'] += count
+            elif rows['endIndex'] > grid_range['startIndex']:
+                rows['endIndex'] += count
+
+    def _request_deleteDimension(self, body):
+        grid_range = body['range']
+        tab = self.tab_by_id(grid_range['sheetId'])
+        if grid_range['dimension'] != 'ROWS':
+            raise APIError(400, 'INVALID_ARGUMENT', "Fake Sheets only deletes ROWS")
+        start, end = grid_range['startIndex'], grid_range['endIndex']
+        tab.delete_rows(start + 1, end - start)
+        # Metadata on the deleted rows goes with them; metadata below moves up
+        kept = []
+        for metadata in self.developer_metadata:
+            rows = metadata['location']['dimensionRange']
+            if rows['sheetId'] == tab.properties['sheetId']:
+                if start <= rows['startIndex'] and rows['endIndex'] <= end:
+                    continue
+                rows['startIndex'] -= max(0, min(rows['startIndex'], end) - start)
+                rows['endIndex'] -= max(0, min(rows['endIndex'], end) - start)
+            kept.append(metadata)
+        self.developer_metadata = kept
+
+    def _request_appendDimension(self, body):
+        tab = self.tab_by_id(body['sheetId'])
+        key = 'rowCount' if body['dimension'] == 'ROWS' else 'columnCount'
+        tab.grid[key] += body['length']
+
+    def _request_createDeveloperMetadata(self, body):
+        metadata = json.loads(json.dumps(body['developerMetadata']))
+        rows = metadata.get('location', {}).get('dimensionRange')
+        if rows is None or rows.get('dimension') != 'ROWS':
+            raise APIError(400, 'INVALID_ARGUMENT', "Fake Sheets only stores developer metadata on row ranges")
+        self.tab_by_id(rows['sheetId'])
+        metadata['location']['locationType'] = 'ROW'
+        metadata['metadataId'] = max((m['metadataId'] for m in self.developer_metadata), default=0) + 1
+        self.developer_metadata.append(metadata)
+        return {'createDeveloperMetadata': {'developerMetadata': metadata}}
+
+    def _request_deleteDeveloperMetadata(self, body):
+        deleted = self._matching_metadata(body['dataFilter'])
+        self.developer_metadata = [metadata for metadata in self.developer_metadata if metadata not in deleted]
+        return {'deleteDeveloperMetadata': {'deletedDeveloperMetadata': deleted}}
+
+    def _request_updateDeveloperMetadata(self, body):
+        fields = body['fields'].split(',')
+        if any(field not in ('location', 'metadataValue') for field in fields):
+            raise APIError(400, 'INVALID_ARGUMENT', "Fake Sheets only updates location and metadataValue")
+        updated = [metadata for data_filter in body['dataFilters'] for metadata in self._matching_metadata(data_filter)]
+        for metadata in updated:
+            for field in fields:
+                metadata[field] = json.loads(json.dumps(body['developerMetadata'][field]))
+            metadata['location']['locationType'] = 'ROW'
+        return {'updateDeveloperMetadata': {'developerMetadata': updated}}
+
+    def _request_updateBorders(self, body):
+        self._grid_range(body['range'])
+
+    def _request_copyPaste(self, body):
+        source, sr1, sc1, sr2, sc2 = self._grid_range(body['source'])
+        destination, dr1, dc1, _, _ = self._grid_range(body['destination'])
+        rows = [[source.cells.get((row, column), '') for column in range(sc1, sc2 + 1)]
+                for row in range(sr1, min(sr2, source.max_row()) + 1)]
+        destination.write(dr1, dc1, rows)
+
+    @staticmethod
+    def _row_values(rows):
+        return [[next(iter(cell.get('userEnteredValue', {}).values()), '') for cell in row.get('values', [])]
+                for row in rows]
+
+    def _request_updateCells(self, body):
+        tab, r1, c1, r2, c2 = self._grid_range(body['range'])
+        tab.clear(r1, c1, r2, c2)
+        tab.write(r1, c1, self._row_values(body.get('rows', [])))
+
+    def _request_appendCells(self, body):
+        tab = self.tab_by_id(body['sheetId'])
+        tab.write(tab.max_row() + 1, 1, self._row_values(body.get('rows', [])))
+
+class FakeSheetsServer:
+    """
+    Local HTTP stand-in for the parts of the Sheets v4 API gspread uses here.
+
+    Point http_transport at it with SHEETS_API_ENDPOINT. Every call is counted
+    by method and spreadsheet, and latency and transient 503 errors can be
+    injected to exercise retry_with_backoff. Errors are returned before the
+    request is applied, like a rejected call, so a retry is always safe.
+
+    Usage:
+        with FakeSheetsServer(latency=0.05, error_rate=0.02) as server:
+            server.add_spreadsheet("sheet-1", ["MLB"])
+            os.environ['SHEETS_API_ENDPOINT'] = server.url
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None):
+        """
+        Args:
+            latency (float): Seconds added to every response
+            error_rate (float): Probability of answering a call with a 503
+            seed (int, optional): Seed for the error injection
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.spreadsheets = {}
+        self.calls = Counter()
+        self.calls_by_spreadsheet = Counter()
+        self.injected_errors = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+    def add_spreadsheet(self, spreadsheet_id, tab_titles, header_rows=None, title=None):
+        """
+        Create a spreadsheet whose tabs have sheetIds 0, 1, ... in the order given.
+
+        Args:
+            spreadsheet_id (str): Key used by open_by_key
+            tab_titles (list): Tab titles
+            header_rows (list, optional): Rows written at A1 of every tab
+            title (str, optional): Spreadsheet title. Defaults to the id.
+        """
+        spreadsheet = FakeSpreadsheet(spreadsheet_id, title or spreadsheet_id,
+                                      [{'sheetId': i, 'title': t} for i, t in enumerate(tab_titles)])
+        for tab in spreadsheet.tabs:
+            if header_rows:
+                tab.write(1, 1, header_rows)
+        with self._lock:
+            self.spreadsheets[spreadsheet_id] = spreadsheet
+        return spreadsheet
+
+    def _dispatch(self, method, path, query, body):
+        """Route one request; returns the JSON response or raises APIError."""
+        match = re.match(r'^/v4/spreadsheets/([^/:]+)(.*)$', path)
+        if match is None:
+            raise APIError(404, 'NOT_FOUND', f"Fake Sheets has no route for {path}")
+        spreadsheet_id, rest = match.group(1), unquote(match.group(2))
+        spreadsheet = self.spreadsheets.get(spreadsheet_id)
+        if spreadsheet is None:
+            raise APIError(404, 'NOT_FOUND', "Requested entity was not found.")
+
+        if method == 'GET' and rest == '':
+            name, result = 'spreadsheets.get', lambda: spreadsheet.metadata()
+        elif method == 'POST' and rest == ':batchUpdate':
+            name, result = 'spreadsheets.batchUpdate', lambda: spreadsheet.batch_update(body.get('requests', []))
+        elif method == 'POST' and rest == '/developerMetadata:search':
+            name = 'developerMetadata.search'
+            result = lambda: spreadsheet.search_developer_metadata(body.get('dataFilters', []))
+        elif method == 'GET' and rest == '/values:batchGet':
+            name = 'values.batchGet'
+            result = lambda: {'spreadsheetId': spreadsheet_id,
+                              'valueRanges': [spreadsheet.values_get(a1) for a1 in query.get('ranges', [])]}
+        elif method == 'POST' and rest == '/values:batchUpdate':
+            name = 'values.batchUpdate'
+            result = lambda: {'spreadsheetId': spreadsheet_id,
+                              'responses': [spreadsheet.values_update(data['range'], data.get('values', []))
+                                            for data in body.get('data', [])]}
+        elif method == 'GET' and rest.startswith('/values/'):
+            name, result = 'values.get', lambda: spreadsheet.values_get(rest[len('/values/'):])
+        elif method == 'PUT' and rest.startswith('/values/'):
+            name, result = 'values.update', lambda: spreadsheet.values_update(rest[len('/values/'):], body.get('values', []))
+        else:
+            raise APIError(404, 'NOT_FOUND', f"Fake Sheets has no route for {method} {path}")
+
+        with self._lock:
+            self.calls[name] += 1
+            self.calls_by_spreadsheet[spreadsheet_id] += 1
+            if self._random.random() < self.error_rate:
+                self.injected_errors[name] += 1
+                raise APIError(503, 'UNAVAILABLE', "The service is currently unavailable.")
+            return result()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _handle(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                raw = self.rfile.read(length) if length else b''
+                try:
+                    body = json.loads(raw) if raw else {}
+                    if server.latency:
+                        time.sleep(server.latency)
+                    status, payload = 200, server._dispatch(self.command, parts.path, parse_qs(parts.query), body)
+                except APIError as e:
+                    status, payload = e.code, {'error': {'code': e.code, 'message': e.message, 'status': e.status}}
+                data = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PUT = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,73 @@
+import os
+
+import gspread
+from google.auth.transport.requests import AuthorizedSession
+from requests.adapters import HTTPAdapter
+
+# Pool and timeout settings, overridable from the league .env files
+POOL_SIZE = int(os.getenv('SHEETS_HTTP_POOL_SIZE', '10'))
+CONNECT_TIMEOUT = float(os.getenv('SHEETS_HTTP_CONNECT_TIMEOUT', '10'))
+READ_TIMEOUT = float(os.getenv('SHEETS_HTTP_READ_TIMEOUT', '60'))
+
+# Send Sheets API traffic somewhere else, e.g. the replay harness's fake Sheets server
+SHEETS_API_ROOT = 'https://sheets.googleapis.com'
+SHEETS_API_ENDPOINT = os.getenv('SHEETS_API_ENDPOINT')
+
+# One authorized session per credentials object, shared by every client in the process
+_sessions = {}
+
+class PooledAdapter(HTTPAdapter):
+    """
+    Keep-alive connection pool that applies default timeouts and counts traffic.
+
+    Requests sent without an explicit timeout (gspread's default) get
+    (CONNECT_TIMEOUT, READ_TIMEOUT) instead of waiting forever.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE):
+        self.request_count = 0
+        super().__init__(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+
+    def send(self, request, **kwargs):
+        if SHEETS_API_ENDPOINT and request.url.startswith(SHEETS_API_ROOT):
+            request.url = SHEETS_API_ENDPOINT.rstrip('/') + request.url[len(SHEETS_API_ROOT):]
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = (CONNECT_TIMEOUT, READ_TIMEOUT)
+        self.request_count += 1
+        return super().send(request, **kwargs)
+
+    def connection_count(self):
+        """Number of connections (and so TLS handshakes) opened across all pools."""
+        pools = self.poolmanager.pools
+        return sum(pools[key].num_connections for key in list(pools.keys()) if key in pools)
+
+def get_authorized_session(credentials):
+    """
+    Return the process-wide pooled AuthorizedSession for these credentials.
+
+    Args:
+        credentials: google-auth credentials (CachedCredentials in this repo)
+
+    Returns:
+        AuthorizedSession: Session with a keep-alive PooledAdapter mounted for https
+    """
+    key = id(credentials)
+    if key not in _sessions:
+        session = AuthorizedSession(credentials)
+        adapter = PooledAdapter()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        _sessions[key] = session
+    return _sessions[key]
+
+def gspread_client(credentials):
+    """Create a gspread client that sends through the shared session."""
+    return gspread.Client(auth=credentials, session=get_authorized_session(credentials))
+
+def print_transport_stats():
+    """Print request and connection counts for every shared session."""
+    for session in _sessions.values():
+        adapter = session.get_adapter('https://')
+        if isinstance(adapter, PooledAdapter):
+            print(f"Sheets HTTP: {adapter.request_count} requests over "
+                  f"{adapter.connection_count()} connections (TLS handshakes).")
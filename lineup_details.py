@@ -0,0 +1,197 @@
+import os
+
+from gspread.urls import SPREADSHEET_URL
+
+from sheet_layout import tab_id
+from sheets_retry import retry_with_backoff
+
+# Capture full lineups (players, positions, order, status) with LINEUP_DETAILS=1
+LINEUP_DETAILS = os.getenv('LINEUP_DETAILS') == '1'
+
+LINEUP_HEADER = ["Date", "Game", "Team", "Side", "Status", "Order", "Pos", "Player", "Note"]
+
+# Each date's rows on a Lineups tab carry developer metadata with the date as
+# the value, so a rerun replaces them instead of adding a second copy
+LINEUPS_METADATA_KEY = "lineups-{sheet_id}"
+
+# Walks every game container in the browser and returns plain data, so the
+# whole page is read in a single WebDriver round trip instead of several
+# find_element/.text calls per game. Each side comes back as
+# [status, [[order, position, name, note], ...]]: MLB starting pitchers have
+# order "SP", NBA players listed under a section title (e.g. "MAY NOT PLAY")
+# have no order and the section in their note.
+LINEUP_SCRIPT = """
+function text(el) { return el ? el.innerText.trim() : ""; }
+function side(list) {
+    var status = "", section = "", order = 0, players = [];
+    if (!list) { return [status, players]; }
+    for (var i = 0; i < list.children.length; i++) {
+        var item = list.children[i], cls = item.classList;
+        if (cls.contains("lineup__status")) {
+            status = text(item).replace(/ lineup$/i, "").toLowerCase();
+        } else if (cls.contains("lineup__title")) {
+            section = text(item).toLowerCase();
+        } else if (cls.contains("lineup__player-highlight")) {
+            var pitcher = item.querySelector(".lineup__player-highlight-name a");
+            if (pitcher) {
+                players.push(["SP", "P", pitcher.title || text(pitcher), text(item.querySelector(".lineup__throws"))]);
+            }
+        } else if (cls.contains("lineup__player")) {
+            var link = item.querySelector("a");
+            var note = [text(item.querySelector(".lineup__bats, .lineup__inj")), section].filter(Boolean).join(" ");
+            players.push([section ? "" : ++order, text(item.querySelector(".lineup__pos")),
+                          link ? (link.title || text(link)) : text(item), note]);
+        }
+    }
+    return [status, players];
+}
+return Array.prototype.map.call(arguments[0], function (game) {
+    return [text(game.querySelector(".lineup__team.is-visit")),
+            text(game.querySelector(".lineup__team.is-home")),
+            {away: side(game.querySelector(".lineup__list.is-visit")),
+             home: side(game.querySelector(".lineup__list.is-home"))}];
+});
+"""
+
+def extract_lineups(driver, game_elements):
+    """
+    Read teams and full lineups for every game container in one script call.
+
+    Args:
+        driver (webdriver.Firefox): Driver with the lineups page loaded
+        game_elements (list): Game container elements found by the scraper
+
+    Returns:
+        list: [away_team, home_team, {'away': [status, players], 'home': [status, players]}]
+              per game, in page order
+    """
+    return driver.execute_script(LINEUP_SCRIPT, game_elements)
+
+def lineup_rows(block_date, games):
+    """Flatten [game_index, away, home, lineups] rows into one sheet row per player."""
+    rows = []
+    for game in games:
+        if len(game) < 4:
+            continue
+        game_index, away, home, lineups = game
+        for side, team in (("away", away), ("home", home)):
+            status, players = lineups.get(side) or ["", []]
+            for order, position, name, note in players:
+                rows.append([block_date, game_index, team.lower(), side, status, order, position, name, note])
+    return rows
+
+@retry_with_backoff()
+def _open_spreadsheet(client, sheet_id):
+    return client.open_by_key(sheet_id)
+
+@retry_with_backoff()
+def _list_worksheets(spreadsheet):
+    return spreadsheet.worksheets()
+
+@retry_with_backoff()
+def _spreadsheet_batch_update(spreadsheet, requests):
+    return spreadsheet.batch_update({'requests': requests})
+
+@retry_with_backoff()
+def _search_developer_metadata(spreadsheet, data_filters):
+    response = spreadsheet.client.request(
+        'post', f"{SPREADSHEET_URL % spreadsheet.id}/developerMetadata:search", json={'dataFilters': data_filters},
+    )
+    return response.json().get('matchedDeveloperMetadata', [])
+
+def _cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': str(value)}}
+
+def _row_data(rows):
+    return [{'values': [_cell(value) for value in row]} for row in rows]
+
+def update_lineups_in_sheets(sheets_info, client, block_date, games):
+    """
+    Write the players of a block's games to each sheet's '<tab> Lineups' tab.
+
+    Rows are appended below the last tagged date and tagged with their own
+    date, so earlier dates never move. One developerMetadata.search finds
+    every date's rows; rows already tagged with block_date are deleted in
+    the same spreadsheets.batchUpdate, so rerunning a date replaces its rows.
+    The tab is created on first use with a frozen header row, in that
+    batchUpdate too.
+
+    Args:
+        sheets_info (list): List of sheet information dictionaries
+        client (gspread.Client): Authorized gspread client
+        block_date (str): Date the games were written under, YYYY-MM-DD
+        games (list): [game_index, away, home, lineups] rows from the scraper
+    """
+    rows = lineup_rows(block_date, games)
+    if not rows:
+        print("No lineup details were captured. Skipping lineups update.")
+        return
+
+    for sheet_info in sheets_info:
+        spreadsheet = _open_spreadsheet(client, sheet_info["sheet_id"])
+        worksheets = _list_worksheets(spreadsheet)
+        base_id = int(sheet_info["worksheet_GID"])
+        base_title = next((worksheet.title for worksheet in worksheets if worksheet.id == base_id), None)
+        if base_title is None:
+            print(f"Worksheet with ID {base_id} not found in {sheet_info['name']}.")
+            continue
+
+        title = f"{base_title} Lineups"
+        lineups_id = tab_id(title)
+        key = LINEUPS_METADATA_KEY.format(sheet_id=lineups_id)
+        lineups_worksheet = next((worksheet for worksheet in worksheets if worksheet.id == lineups_id), None)
+        requests = []
+        if lineups_worksheet is None:
+            requests.append({'addSheet': {'properties': {
+                'sheetId': lineups_id, 'title': title,
+                'gridProperties': {'rowCount': 1000, 'frozenRowCount': 1},
+            }}})
+            requests.append({'appendCells': {'sheetId': lineups_id, 'rows': _row_data([LINEUP_HEADER]),
+                                             'fields': 'userEnteredValue'}})
+            tagged = []
+            row_count = 1000
+        else:
+            matches = _search_developer_metadata(spreadsheet, [{'developerMetadataLookup': {'metadataKey': key}}])
+            tagged = [match['developerMetadata'] for match in matches]
+            row_count = lineups_worksheet.row_count
+        replaced = [metadata['location']['dimensionRange'] for metadata in tagged
+                    if metadata['metadataValue'] == block_date]
+
+        # Bottom-up, so each delete leaves the rows of the next one in place;
+        # deleting the rows also deletes their tag
+        for rows_range in sorted(replaced, key=lambda rows_range: rows_range['startIndex'], reverse=True):
+            requests.append({'deleteDimension': {'range': rows_range}})
+
+        # Append below the last date still tagged, once the deletes above it have moved it up
+        start_index = 1
+        for metadata in tagged:
+            rows_range = metadata['location']['dimensionRange']
+            if metadata['metadataValue'] == block_date:
+                continue
+            removed_above = sum(deleted['endIndex'] - deleted['startIndex'] for deleted in replaced
+                                if deleted['startIndex'] < rows_range['startIndex'])
+            start_index = max(start_index, rows_range['endIndex'] - removed_above)
+        row_count -= sum(deleted['endIndex'] - deleted['startIndex'] for deleted in replaced)
+        if start_index + len(rows) > row_count:
+            requests.append({'appendDimension': {
+                'sheetId': lineups_id,
+                'dimension': 'ROWS',
+                'length': start_index + len(rows) - row_count + 500,
+            }})
+
+        rows_range = {'sheetId': lineups_id, 'dimension': 'ROWS',
+                      'startIndex': start_index, 'endIndex': start_index + len(rows)}
+        requests.append({'updateCells': {
+            'range': {'sheetId': lineups_id, 'startRowIndex': start_index, 'endRowIndex': start_index + len(rows),
+                      'startColumnIndex': 0, 'endColumnIndex': len(LINEUP_HEADER)},
+            'rows': _row_data(rows), 'fields': 'userEnteredValue',
+        }})
+        requests.append({'createDeveloperMetadata': {'developerMetadata': {
+            'metadataKey': key, 'metadataValue': block_date, 'visibility': 'DOCUMENT',
+            'location': {'dimensionRange': rows_range},
+        }}})
+        _spreadsheet_batch_update(spreadsheet, requests)
+        action = "Replaced" if replaced else "Wrote"
+        print(f"{action} {len(rows)} lineup rows for {block_date} in '{title}' in {sheet_info['name']}.")
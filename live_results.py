@@ -0,0 +1,194 @@
+import argparse
+import hashlib
+import importlib
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import sheets_outbox
+from scrape_supervisor import BrowserSupervisor
+
+# Polling intervals in seconds
+LIVE_INTERVAL = 60        # at least one game in progress
+IDLE_INTERVAL = 600       # nothing started yet
+MAX_INTERVAL = 900        # cap for backing off on unchanged pages
+BACKOFF_FACTOR = 1.5
+
+# Rotowire scoreboards are dated in US Eastern time. The pollers run on UTC
+# runners into the early hours, when the runner's date is already tomorrow.
+SCOREBOARD_TZ = ZoneInfo("America/New_York")
+
+def scoreboard_date():
+    """Today's date on the scoreboard, YYYY-MM-DD in US Eastern time."""
+    return datetime.now(SCOREBOARD_TZ).strftime('%Y-%m-%d')
+
+# Scraper/sheet modules and scoreboard fingerprint script for each league.
+# The fingerprint only covers the game cards, so ads and page chrome
+# changing between refreshes do not force a re-parse.
+LEAGUES = {
+    "mlb": {
+        "scraper": "mlb_scraper",
+        "sheets": "mlb_gcp",
+        "url": lambda scraper: f"{scraper.SCOREBOARD_URL}?date={scoreboard_date()}",
+        "fingerprint_script": """
+            var result = document.evaluate(arguments[0], document, null,
+                XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            var parts = [];
+            for (var i = 0; i < result.snapshotLength; i++) {
+                parts.push(result.snapshotItem(i).innerText);
+            }
+            return parts.join('\\u241e');
+        """,
+        "fingerprint_arg": lambda scraper: scraper.GAME_CONTAINER_XPATH,
+        "ready": lambda scraper: scraper.SCOREBOARD_READY,
+    },
+    "nba": {
+        "scraper": "nba_scraper",
+        "sheets": "gcp_test",
+        "url": lambda scraper: f"{scraper.SCOREBOARD_URL}?date={scoreboard_date()}",
+        "fingerprint_script": """
+            var nodes = document.querySelectorAll(arguments[0]);
+            var parts = [];
+            for (var i = 0; i < nodes.length; i++) {
+                var card = nodes[i].closest('.col-4') || nodes[i];
+                parts.push(card.innerText);
+            }
+            return parts.join('\\u241e');
+        """,
+        "fingerprint_arg": lambda scraper: scraper.SCORE_SELECTOR,
+        "ready": lambda scraper: scraper.SCOREBOARD_READY,
+    },
+}
+
+def page_fingerprint(driver, league_config, scraper):
+    """
+    Hash the text of the scoreboard's game cards with a single WebDriver call.
+
+    Returns:
+        str: SHA-256 hex digest of the game card text
+    """
+    text = driver.execute_script(league_config["fingerprint_script"], league_config["fingerprint_arg"](scraper))
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def final_winners(games):
+    """
+    Build {game_index: {'winner': 'HOME'/'AWAY', 'away': str, 'home': str}} for games that have reached final.
+
+    Ties and games without two parsable scores are left out.
+    """
+    winners = {}
+    for game in games:
+        if game["status"] != "final":
+            continue
+        away_score = game["away_score"]
+        home_score = game["home_score"]
+        if away_score is None or home_score is None or away_score == home_score:
+            continue
+        winners[game["index"]] = {"winner": "AWAY" if away_score > home_score else "HOME",
+                                  "away": game["away"], "home": game["home"]}
+    return winners
+
+def next_interval(games, changed, current_interval):
+    """
+    Pick how long to wait before the next refresh.
+
+    Polls quickly while games are live, slowly before first pitch/tip-off,
+    and backs off further every time the page comes back unchanged.
+    """
+    if not changed:
+        return min(current_interval * BACKOFF_FACTOR, MAX_INTERVAL)
+    if any(game["status"] == "live" for game in games):
+        return LIVE_INTERVAL
+    return IDLE_INTERVAL
+
+def poll_live_results(league, max_hours=8):
+    """
+    Poll a league's scoreboard and write winners as games reach final.
+
+    Only games whose winner has not been written yet are sent to the sheets,
+    so each write covers just the games that finished since the last one.
+    Winners go through the same path as the nightly run's results, so they
+    are matched to rows by team and marked resolved for that run.
+
+    Args:
+        league (str): League key in LEAGUES ('mlb' or 'nba')
+        max_hours (float): Stop polling after this many hours
+
+    Returns:
+        dict: All winners written during this session
+    """
+    league_config = LEAGUES[league]
+    scraper = importlib.import_module(league_config["scraper"])
+    sheets = None
+
+    deadline = datetime.now() + timedelta(hours=max_hours)
+    written = {}
+    last_fingerprint = None
+    interval = IDLE_INTERVAL
+    games = []
+
+    url = league_config["url"](scraper)
+    ready = league_config["ready"](scraper)
+    # The poller is one long stage, so give it the whole polling window
+    stage_deadline = max_hours * 3600 + MAX_INTERVAL
+    with BrowserSupervisor(scraper.setup_ff_driver, f"Live {league.upper()} results", stage_deadline=stage_deadline) as supervisor:
+        driver = supervisor.load(url, ready=ready)
+        time.sleep(3)
+
+        while datetime.now() < deadline:
+            fingerprint = page_fingerprint(driver, league_config, scraper)
+            changed = fingerprint != last_fingerprint
+
+            if changed:
+                last_fingerprint = fingerprint
+                games = scraper.parse_scoreboard(driver)
+                winners = final_winners(games)
+
+                # Diff against what has already been written this session
+                new_results = {i: result for i, result in winners.items() if written.get(i) != result}
+
+                if new_results:
+                    # Import lazily so credentials are only loaded once there is something to write
+                    if sheets is None:
+                        sheets = importlib.import_module(league_config["sheets"])
+                    try:
+                        results_date = scoreboard_date()
+                        sheets.update_results_in_sheets(sheets.sheets_info, results_date, {results_date: new_results})
+                        # Queued winners are durable, but only count as written once every sheet has them
+                        remaining = sum(sheets_outbox.flush(sheets.client, sheet_info["sheet_id"])
+                                        for sheet_info in sheets.sheets_info)
+                        if remaining:
+                            raise RuntimeError(f"{remaining} Sheets updates are still waiting in the outbox")
+                        written.update(new_results)
+                        print(f"[{datetime.now():%H:%M:%S}] Wrote {len(new_results)} new {league.upper()} result(s): {sorted(new_results)}")
+                    except Exception as e:
+                        # Force a re-parse on the next poll so the write is retried
+                        last_fingerprint = None
+                        print(f"Failed to write live results: {e}")
+
+                if games and all(game["status"] == "final" for game in games) and len(written) >= len(winners):
+                    print(f"All {len(games)} {league.upper()} games are final.")
+                    break
+            else:
+                print(f"[{datetime.now():%H:%M:%S}] Scoreboard unchanged, skipping parse.")
+
+            interval = next_interval(games, changed, interval)
+            time.sleep(interval)
+            # Reload through the supervisor so a hung refresh is killed and retried
+            driver = supervisor.load(url, ready=ready)
+        else:
+            print(f"Stopped polling after {max_hours} hours.")
+
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Write game winners to the sheets as games go final.")
+    parser.add_argument("league", choices=sorted(LEAGUES), help="League to poll")
+    parser.add_argument("--max-hours", type=float, default=8, help="Stop polling after this many hours")
+    args = parser.parse_args()
+
+    written = poll_live_results(args.league, max_hours=args.max_hours)
+    print(f"Live {args.league.upper()} polling complete, {len(written)} result(s) written.")
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,23 @@
+import argparse
 import datetime
-import gspread
 import os
-import time
-import random
-from functools import wraps
 from dotenv import load_dotenv
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from token_cache import CachedCredentials
+from http_transport import gspread_client, print_transport_stats
 
-from mlb_scraper import collect_mlb_game_data, update_game_results
+from checkpoint import RunCheckpoint
+from stage_pipeline import StagePipeline
+from sheets_retry import retry_with_backoff
+import pending_results
+import sheets_outbox
+from sheet_layout import FIRST_BLOCK_ROW, block_tags, existing_block, prepare_block, record_block, locate_block
+from mlb_scraper import collect_mlb_game_data, collect_game_results
+from profiling import profile_run
+from lineup_details import LINEUP_DETAILS, update_lineups_in_sheets
 
 # Constants
-START_CELL = "A3"
 NUM_COLUMNS = 6
 
-def retry_with_backoff(max_retries=5, initial_delay=5):
-    """
-    Decorator that implements retry logic with exponential backoff for API calls.
-    
-    Args:
-        max_retries (int): Maximum number of retry attempts
-        initial_delay (int): Initial delay in seconds before first retry
-        
-    Returns:
-        function: Decorated function with retry logic
-    """
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            delay = initial_delay
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    # Check if we've reached max retries
-                    if attempt == max_retries - 1:
-                        print(f"Failed after {max_retries} attempts: {str(e)}")
-                        raise
-                    
-                    jitter = random.uniform(0, 1)
-                    wait_time = delay + jitter
-                    
-                    print(f"Attempt {attempt + 1} failed with error: {str(e)}. Retrying in {wait_time:.2f} seconds...")
-                    time.sleep(wait_time)
-                    
-                    # Exponential backoff - double the delay for next attempt
-                    delay *= 2
-        return wrapper
-    return decorator
-
 # OAuth2 scope
 scopes = ['https://www.googleapis.com/auth/spreadsheets']
 
@@ -57,12 +26,12 @@ load_dotenv('.mlb.env')
 json_credentials = os.getenv('JSON_CREDENTIALS')
 
 # load service account from JSON credentials file
-credentials = Credentials.from_service_account_file(json_credentials, scopes=scopes)
-client = gspread.authorize(credentials)
+credentials = CachedCredentials.from_service_account_file(json_credentials, scopes=scopes)
+client = gspread_client(credentials)
 
 # List of Google Sheets with unique IDs and worksheet GIDs for MLB
 sheets_info = [
-    {"sheet_id": os.getenv('SHEET_ID'), "worksheet_GID": os.getenv('WORKSHEET_GID'), "name": "MLB Sheet"},
+    {"sheet_id": os.getenv('SHEET_ID'), "worksheet_GID": os.getenv('WORKSHEET_GID'), "name": "MLB Sheet", "layout": os.getenv('SHEET_LAYOUT', 'insert')},
 ]
 
 @retry_with_backoff()
@@ -80,24 +49,20 @@ def get_cell_value(worksheet, row, col):
     """Get a cell value with retry logic."""
     return worksheet.cell(row, col).value
 
-@retry_with_backoff()
 def batch_update(worksheet, update_requests):
-    """Perform a batch update with retry logic."""
-    worksheet.batch_update(update_requests)
+    """Queue a batch of cell writes on a worksheet in the outbox."""
+    sheets_outbox.enqueue_values(worksheet.spreadsheet_id, [
+        {'range': f"'{worksheet.title}'!{request['range']}", 'values': request['values']}
+        for request in update_requests
+    ])
 
-@retry_with_backoff()
 def update_acell(worksheet, cell, value):
-    """Update a single cell with retry logic."""
-    worksheet.update_acell(cell, value)
-
-@retry_with_backoff()
-def execute_batch_update(service, sheet_id, body):
-    """Execute a batch update with retry logic."""
-    return service.spreadsheets().batchUpdate(spreadsheetId=sheet_id, body=body).execute()
+    """Queue a single cell write in the outbox."""
+    batch_update(worksheet, [{'range': cell, 'values': [[value]]}])
 
 def create_outer_border(sheet_id, worksheet_gid, start_cell, num_rows, num_columns):
     """
-    Create an outer border around a range of cells in a Google Sheet.
+    Queue an outer border around a range of cells in a Google Sheet.
     
     Args:
         sheet_id (str): Google Sheet ID
@@ -106,8 +71,6 @@ def create_outer_border(sheet_id, worksheet_gid, start_cell, num_rows, num_colum
         num_rows (int): Number of rows to include in the border
         num_columns (int): Number of columns to include in the border
     """
-    service = build('sheets', 'v4', credentials=credentials)
-
     start_column = ord(start_cell[0].upper()) - ord('A')
     start_row = int(start_cell[1:]) - 1  # subtract 1 to match 0-based index
 
@@ -127,41 +90,7 @@ def create_outer_border(sheet_id, worksheet_gid, start_cell, num_rows, num_colum
         }
     }]
 
-    body = {'requests': requests}
-    execute_batch_update(service, sheet_id, body)
-
-def insert_cells_and_shift_down(sheet_id, worksheet_gid, start_cell, num_rows, num_columns):
-    """
-    Insert cells and shift existing cells down in a Google Sheet.
-    
-    Args:
-        sheet_id (str): Google Sheet ID
-        worksheet_gid (str): Worksheet GID
-        start_cell (str): Starting cell (e.g., "A3")
-        num_rows (int): Number of rows to insert
-        num_columns (int): Number of columns to span
-    """
-    service = build('sheets', 'v4', credentials=credentials)
-
-    start_column = ord(start_cell[0].upper()) - ord('A')
-    start_row = int(start_cell[1:]) - 1
-
-    # create request to insert cells and shift down
-    requests = [{
-        'insertRange': {
-            'range': {
-                'sheetId': int(worksheet_gid),
-                'startRowIndex': start_row,
-                'endRowIndex': start_row + num_rows,
-                'startColumnIndex': start_column,
-                'endColumnIndex': start_column + num_columns
-            },
-            'shiftDimension': 'ROWS'
-        }
-    }]
-
-    body = {'requests': requests}
-    execute_batch_update(service, sheet_id, body)
+    sheets_outbox.enqueue_requests(sheet_id, requests)
 
 def update_tomorrows_games_in_sheets(sheets_info, tomorrows_games):
     """
@@ -191,19 +120,31 @@ def update_tomorrows_games_in_sheets(sheets_info, tomorrows_games):
         if worksheet is None:
             continue
 
-        insert_cells_and_shift_down(sheet_id, worksheet_gid, START_CELL, num_rows, NUM_COLUMNS)
-        create_outer_border(sheet_id, worksheet_gid, START_CELL, num_rows, NUM_COLUMNS)
-        
-        # Add tomorrow's date to top left cell
         tomorrow = datetime.datetime.now() + datetime.timedelta(days=1)
         tomorrow_date = tomorrow.strftime('%Y-%m-%d')
-        update_acell(worksheet, START_CELL, tomorrow_date)
+        layout = sheet_info.get("layout", "insert")
+
+        # A rerun after a failure writes into the block the failed attempt placed,
+        # so rows are never inserted twice for the same date
+        tags = block_tags(sheet, "mlb", worksheet.id)
+        block_worksheet, start_row = existing_block(sheet, worksheet, "mlb", tomorrow_date, num_rows, tags)
+        if block_worksheet is None:
+            # Make room for the block according to the sheet's layout
+            block_worksheet, start_row = prepare_block(sheet, worksheet, "mlb", tomorrow_date, num_rows, NUM_COLUMNS, layout, tags)
+            if layout == "insert":
+                # Games still waiting for a result just moved down
+                pending_results.shift_rows("mlb", sheet_id, worksheet.title, FIRST_BLOCK_ROW, num_rows)
+        start_cell = f"A{start_row}"
+        create_outer_border(sheet_id, block_worksheet.id, start_cell, num_rows, NUM_COLUMNS)
+        
+        # Add tomorrow's date to top left cell
+        update_acell(block_worksheet, start_cell, tomorrow_date)
 
         # Store a list and append as a batch
         update_requests = []
         # Update cells from B:away to C:home columns
         for game_info in tomorrows_games:
-            row_number = game_info[0] + 2
+            row_number = start_row + game_info[0] - 1
             update_requests.append({
                 'range': f'B{row_number}',
                 'values': [[game_info[1].lower()]]
@@ -215,10 +156,21 @@ def update_tomorrows_games_in_sheets(sheets_info, tomorrows_games):
         
         # Perform the batch update
         if update_requests:
-            batch_update(worksheet, update_requests)
+            batch_update(block_worksheet, update_requests)
+            record_block(sheet, worksheet, block_worksheet, tomorrow_date, start_row, num_rows, layout)
+            # Results for this block come from today's scoreboard, read on tomorrow's run
+            today_date = datetime.datetime.now().strftime('%Y-%m-%d')
+            pending_results.add_block("mlb", sheet_id, block_worksheet.title, tomorrow_date, today_date, start_row, tomorrows_games)
             print(f"Tomorrow's MLB games updated in {sheet_name}.")
 
 def update_game_results_in_sheets(sheets_info, game_results):
+    if not game_results:
+        print("No MLB game results to update from yesterday. Skipping update.")
+        return
+
+    # JSON checkpoints store the game index keys as strings
+    game_results = {int(i): result for i, result in game_results.items()}
+
     for sheet_info in sheets_info:
         sheet_id = sheet_info["sheet_id"]
         worksheet_gid = sheet_info["worksheet_GID"]
@@ -232,21 +184,30 @@ def update_game_results_in_sheets(sheets_info, game_results):
         if worksheet is None:
             continue
 
+        # The cells read below may still have writes waiting in the outbox
+        sheets_outbox.drain(client, sheet_id)
+
+        # The results belong to the newest block
+        block_worksheet, start_row = locate_block(sheet, worksheet, "mlb", sheet_info.get("layout", "insert"))
+        if block_worksheet is None:
+            print(f"No game block found in {sheet_name}, skipping results.")
+            continue
+
         # Create a list to store the batch update requests
         update_requests = []
         
         for i, game_info in game_results.items():
-            row_number = i + 2  # A3
+            row_number = start_row + i - 1
             winner = game_info['winner']
 
             if winner == "AWAY":
-                away_team = get_cell_value(worksheet, row_number, 2)
+                away_team = get_cell_value(block_worksheet, row_number, 2)
                 update_requests.append({
                     'range': f'D{row_number}',
                     'values': [[away_team]]
                 })
             elif winner == "HOME":
-                home_team = get_cell_value(worksheet, row_number, 3)
+                home_team = get_cell_value(block_worksheet, row_number, 3)
                 update_requests.append({
                     'range': f'D{row_number}',
                     'values': [[home_team]]
@@ -256,36 +217,108 @@ def update_game_results_in_sheets(sheets_info, game_results):
 
         # Perform the batch update
         if update_requests:
-            batch_update(worksheet, update_requests)
+            batch_update(block_worksheet, update_requests)
             print(f"MLB game results updated in {sheet_name}.")
 
-def main():
+def scrape_pending_results(yesterday_date):
+    """Scrape yesterday's scoreboard and every earlier date that still has MLB games without a winner."""
+    dates = sorted(set(pending_results.pending_dates("mlb")) | {yesterday_date})
+    return collect_game_results(dates)
+
+def update_results_in_sheets(sheets_info, yesterday_date, results_by_date):
+    """
+    Write every result that is now known: yesterday's and any late, suspended or postponed games.
+    
+    Blocks written before pending results were tracked fall back to writing
+    yesterday's results into the newest block.
+    """
+    for sheet_info in sheets_info:
+        if not pending_results.tracks_date("mlb", sheet_info["sheet_id"], yesterday_date):
+            update_game_results_in_sheets([sheet_info], results_by_date.get(yesterday_date, {}))
+        pending_results.write_pending_results(client, "mlb", sheet_info, results_by_date)
+
+def main(fresh=False, replay_only=False):
+    """
+    Scrape MLB lineups and results and write them to every sheet.
+    
+    Stages run as a dependency graph (see StagePipeline) and each one is
+    checkpointed for today's run, so rerunning after a failure resumes from
+    the stages that did not complete.
+    
+    Args:
+        fresh (bool): Ignore and discard today's checkpoints
+        replay_only (bool): Only send queued Sheets updates and re-check pending
+                            results, for days without games (see schedule_probe.py)
+    """
+    checkpoint = RunCheckpoint("mlb")
+    checkpoint.prune()
+    if fresh:
+        checkpoint.clear()
+
+    yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
+    yesterday_date = yesterday.strftime('%Y-%m-%d')
+
+    pipeline = StagePipeline(checkpoint)
+    if replay_only:
+        # Off days: no new block, only games still without a winner (yesterday's
+        # scoreboard may hold a postponed game's makeup); anything left in the
+        # outbox is replayed by the flusher below
+        pipeline.add("scrape_pending", scrape_pending_results, yesterday_date)
+        for sheet_info in sheets_info:
+            pipeline.add(f"write_pending-{sheet_info['name']}", pending_results.write_pending_results,
+                         client, "mlb", sheet_info, needs=["scrape_pending"])
+    else:
+        # The two scrapes are independent and run in parallel browsers; each sheet
+        # write starts as soon as its input is ready
+        pipeline.add("scrape_lineups", collect_mlb_game_data, LINEUP_DETAILS)
+        pipeline.add("scrape_results", scrape_pending_results, yesterday_date)
+        write_stages = []
+        for sheet_info in sheets_info:
+            # Checkpoint per sheet so a failure on one sheet does not redo the others
+            results_stage = f"write_results-{sheet_info['name']}"
+            games_stage = f"write_games-{sheet_info['name']}"
+            pipeline.add(results_stage, update_results_in_sheets, [sheet_info], yesterday_date, needs=["scrape_results"])
+            # Results go into the current newest block, so they must land before the new block is placed
+            pipeline.add(games_stage, update_tomorrows_games_in_sheets, [sheet_info],
+                         needs=["scrape_lineups"], after=[results_stage])
+            write_stages += [results_stage, games_stage]
+
+        # Optional player-level lineups, appended to a '<tab> Lineups' tab in one batchUpdate per sheet
+        if LINEUP_DETAILS:
+            tomorrow_date = (datetime.datetime.now() + datetime.timedelta(days=1)).strftime('%Y-%m-%d')
+            pipeline.add("write_lineups", update_lineups_in_sheets, sheets_info, client, tomorrow_date,
+                         needs=["scrape_lineups"])
+
+        # Optional pick accuracy summary, computed in Python and written as one block
+        if os.getenv('PICK_SUMMARY') == '1':
+            from pick_summary import update_pick_summaries
+            pipeline.add("pick_summary", update_pick_summaries, sheets_info, client, after=write_stages)
+
     try:
-        print("Collecting MLB game data for tomorrow...")
-        tomorrows_games = collect_mlb_game_data()
-        
-        print("Collecting MLB game results from yesterday...")
-        yesterday = datetime.datetime.now() - datetime.timedelta(days=1)
-        yesterday_date = yesterday.strftime('%Y-%m-%d')
-        game_results = update_game_results(yesterday_date)
-        
-        if game_results:
-            update_game_results_in_sheets(sheets_info, game_results)
-            print("Yesterday's MLB game results updated!")
+        if replay_only:
+            print("No MLB games today, replaying queued Sheets updates and pending results only...")
         else:
-            print("No MLB game results to update from yesterday.")
-        
-        if tomorrows_games:
-            update_tomorrows_games_in_sheets(sheets_info, tomorrows_games)
-            print("Tomorrow's MLB games updated!")
-        else:
-            print("No MLB games scheduled for tomorrow.")
-            
+            print("Collecting MLB games for tomorrow and results from yesterday...")
+        # Writes go through the outbox and are sent in the background, after
+        # anything an earlier run could not send
+        with sheets_outbox.OutboxFlusher(client, [sheet_info["sheet_id"] for sheet_info in sheets_info]) as flusher:
+            pipeline.run()
+        if flusher.remaining:
+            raise RuntimeError(f"{flusher.remaining} Sheets updates are waiting in the outbox")
         print("MLB update complete for all sheets!")
+        print_transport_stats()
         
     except Exception as e:
         print(f"An error occurred: {str(e)}")
         raise
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Update MLB games and results in Google Sheets.")
+    parser.add_argument("--profile", action="store_true", help="Write CPU, memory and browser RSS profiles to PROFILE_DIR")
+    parser.add_argument("--fresh", action="store_true", help="Ignore today's checkpoints and rerun every stage")
+    parser.add_argument("--replay-only", action="store_true",
+                        help="Only send queued Sheets updates and re-check pending results (days without games)")
+    args = parser.parse_args()
+
+    with profile_run("mlb", enabled=args.profile):
+        main(fresh=args.fresh, replay_only=args.replay_only)
\ No newline at end of file
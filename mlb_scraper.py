@@ -1,3 +1,4 @@
+import os
 import time
 from datetime import datetime, timedelta
 from selenium import webdriver
@@ -6,6 +7,21 @@ from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.firefox.service import Service
 
+from scrape_supervisor import BrowserSupervisor, PAGE_DEADLINE, STAGE_DEADLINE, StageDeadlineExceeded
+from lineup_details import extract_lineups
+
+# Overridable so the replay harness can serve recorded pages
+ROTOWIRE_BASE_URL = os.getenv('ROTOWIRE_BASE_URL', 'https://www.rotowire.com')
+
+# Game containers on the lineups page
+LINEUPS_XPATH = (
+    "//div[contains(@class, 'lineup is-mlb') and "
+    "not(contains(@class, 'lineup is-mlb is-tools')) and "
+    "not(contains(@class, 'is-deposit-offer')) and "
+    "not(contains(@class, 'lineup is-mlb is-tools is-picks')) and "
+    "not(contains(@class, 'lineup-gdc'))]"
+)
+
 def setup_ff_driver():
     """
     Set up and return a Firefox webdriver with headless options.
@@ -19,93 +35,111 @@ def setup_ff_driver():
     driver = webdriver.Firefox(options=firefox_options, service=service)
     return driver
 
-def collect_mlb_game_data():
+def collect_mlb_game_data(details=False):
     """
     Scrape MLB game data from Rotowire's daily lineups page.
     
+    Args:
+        details (bool): Also capture each side's lineup status, starting pitcher
+                        and batting order, read in the same page pass
+    
     Returns:
-        list: List of game data with format [[game_index, away_team, home_team], ...]
+        list: List of game data with format [[game_index, away_team, home_team], ...].
+              With details, each row has a fourth element {'away': [status, players], 'home': ...}
     """
-    driver = setup_ff_driver()
-
-    # URL for MLB lineups on Rotowire (for tomorrow's games)
-    rotowire_url = "https://www.rotowire.com/baseball/daily-lineups.php"
-    driver.get(rotowire_url)
+    with BrowserSupervisor(setup_ff_driver, "MLB lineups") as supervisor:
+        # URL for MLB lineups on Rotowire (for tomorrow's games)
+        rotowire_url = f"{ROTOWIRE_BASE_URL}/baseball/daily-lineups.php"
+        driver = supervisor.load(rotowire_url, ready=(By.XPATH, LINEUPS_XPATH))
     
-    # Give the page time to load
-    time.sleep(3)
+        # Give the page time to load
+        time.sleep(3)
     
-    # Find all game containers
-    game_elements = driver.find_elements(
-        By.XPATH,
-        "//div[contains(@class, 'lineup is-mlb') and "
-        "not(contains(@class, 'lineup is-mlb is-tools')) and "
-        "not(contains(@class, 'is-deposit-offer')) and "
-        "not(contains(@class, 'lineup is-mlb is-tools is-picks')) and "
-        "not(contains(@class, 'lineup-gdc'))]"
-    )
+        # Find all game containers
+        game_elements = driver.find_elements(By.XPATH, LINEUPS_XPATH)
     
-    games_array = []  # To store structured game data
-    game_index = 1
+        games_array = []  # To store structured game data
+        game_index = 1
     
-    print(f"Found {len(game_elements)} MLB games scheduled for tomorrow")
+        print(f"Found {len(game_elements)} MLB games scheduled for tomorrow")
     
-    for game_element in game_elements:
-        try:
-            # Extract text from specific classes for away and home teams
-            away_team_text = game_element.find_element(By.CLASS_NAME, "lineup__team.is-visit").text
-            home_team_text = game_element.find_element(By.CLASS_NAME, "lineup__team.is-home").text
+        # One script call reads teams and lineups for every game
+        scraped = extract_lineups(driver, game_elements) if details else None
+    
+        for game_element in game_elements:
+            try:
+                if scraped:
+                    away_team_text, home_team_text, lineups = scraped[game_index - 1]
+                    if not (away_team_text and home_team_text):
+                        raise ValueError("team names not found")
+                    game_row = [game_index, away_team_text, home_team_text, lineups]
+                else:
+                    # Extract text from specific classes for away and home teams
+                    away_team_text = game_element.find_element(By.CLASS_NAME, "lineup__team.is-visit").text
+                    home_team_text = game_element.find_element(By.CLASS_NAME, "lineup__team.is-home").text
+                    game_row = [game_index, away_team_text, home_team_text]
             
-            # Store the game data
-            game_row = [game_index, away_team_text, home_team_text]
-            games_array.append(game_row)
+                # Store the game data
+                games_array.append(game_row)
             
-            print(f"Game {game_index}: {away_team_text} @ {home_team_text}")
-            game_index += 1
+                print(f"Game {game_index}: {away_team_text} @ {home_team_text}")
+                game_index += 1
                 
-        except Exception as e:
-            print(f"Error processing game {game_index}: {e}")
-            game_index += 1
-    
-    driver.quit()
+            except Exception as e:
+                print(f"Error processing game {game_index}: {e}")
+                game_index += 1
+
     return games_array
 
-def update_game_results(specific_date=None):
+# Rotowire MLB scoreboard (defaults to today's games when no day/date is given)
+SCOREBOARD_URL = f"{ROTOWIRE_BASE_URL}/baseball/scoreboard.php"
+
+# XPath for each game container on the scoreboard
+GAME_CONTAINER_XPATH = "//div[contains(@class, 'col-4') and contains(@class, 'xl-6') and contains(@class, 'md-12')]"
+SCOREBOARD_READY = (By.XPATH, GAME_CONTAINER_XPATH)
+
+# Team links on a scoreboard game card, away team first
+TEAM_LINK_XPATH = ".//a[contains(@href, '/team')]"
+
+def scoreboard_teams(container):
     """
-    Scrape MLB game results from Rotowire's scoreboard page.
+    Read the away and home team abbreviations from a scoreboard game card.
+    
+    Returns:
+        tuple: (away, home) in lower case, or (None, None) if the card does not show two teams
+    """
+    teams = []
+    for link in container.find_elements(By.XPATH, TEAM_LINK_XPATH):
+        # Logo and name links repeat the same team
+        team = link.text.strip().lower()
+        if team and team not in teams:
+            teams.append(team)
+    if len(teams) != 2:
+        return None, None
+    return teams[0], teams[1]
+
+def parse_scoreboard(driver):
+    """
+    Parse every game container on an already loaded Rotowire MLB scoreboard.
     
     Args:
-        specific_date (str, optional): Date in YYYY-MM-DD format. Defaults to yesterday.
+        driver (webdriver.Firefox): Driver currently showing the scoreboard page
         
     Returns:
-        dict: Dictionary of game results with format {game_index: {'winner': 'HOME'/'AWAY'}}
+        list: One dictionary per game with format
+              {'index': n, 'away': str/None, 'home': str/None, 'away_score': int/None,
+               'home_score': int/None, 'status': 'final'/'live'/'upcoming'}
     """
-    if specific_date:
-        target_date = specific_date
-    else:
-        yesterday = datetime.now() - timedelta(days=1)
-        target_date = yesterday.strftime('%Y-%m-%d')
-        
-    url = f"https://www.rotowire.com/baseball/scoreboard.php?day=yesterday"
-    
-    driver = setup_ff_driver()
-    driver.get(url)
+    game_containers = driver.find_elements(By.XPATH, GAME_CONTAINER_XPATH)
     
-    # Give the page time to load
-    time.sleep(3)
-    
-    # Find all game containers using the new structure
-    game_containers = driver.find_elements(
-        By.XPATH,
-        "//div[contains(@class, 'col-4') and contains(@class, 'xl-6') and contains(@class, 'md-12')]"
-    )
-    
-    game_results = {}
-    
-    print(f"Found {len(game_containers)} MLB game elements for date {target_date}.")
+    games = []
     
     for i, container in enumerate(game_containers):
+        game = {"index": i + 1, "away": None, "home": None, "away_score": None, "home_score": None, "status": "upcoming"}
+        games.append(game)
         try:
+            game["away"], game["home"] = scoreboard_teams(container)
+            
             # Find score elements with the specific class and style
             score_elements = container.find_elements(
                 By.XPATH,
@@ -113,51 +147,135 @@ def update_game_results(specific_date=None):
             )
             
             if len(score_elements) >= 2:
-                # Get the first div number from each score element
-                away_score = None
-                home_score = None
-                
                 # First score element should be away team
                 if score_elements[0]:
                     first_div = score_elements[0].find_element(By.XPATH, ".//div[1]")
                     away_score_text = first_div.text.strip()
                     if away_score_text.isdigit():
-                        away_score = int(away_score_text)
+                        game["away_score"] = int(away_score_text)
                 
                 # Second score element should be home team
                 if score_elements[1]:
                     first_div = score_elements[1].find_element(By.XPATH, ".//div[1]")
                     home_score_text = first_div.text.strip()
                     if home_score_text.isdigit():
-                        home_score = int(home_score_text)
+                        game["home_score"] = int(home_score_text)
                 
-                if away_score is not None and home_score is not None:
-                    # Determine winner
-                    if away_score > home_score:
-                        winner = "AWAY"
-                    elif home_score > away_score:
-                        winner = "HOME"
-                    else:
-                        print(f"Tie game found for game {i+1} - skipping")
-                        continue
-
-                    # Store results in dictionary
-                    game_results[i+1] = {
-                        "winner": winner
-                    }
-                    
-                    print(f"Game {i+1}: Away {away_score} - Home {home_score} -> Winner: {winner}")
-                else:
-                    print(f"Game {i+1}: Could not extract valid scores - Away: {away_score}, Home: {home_score}")
-            else:
-                print(f"Game {i+1}: Not enough score elements found - found {len(score_elements)} score elements (upcoming game)")
+                # Games with scores are either in progress or final
+                game["status"] = "final" if "Final" in container.text else "live"
                 
         except Exception as e:
             print(f"Error while processing game {i+1}: {e}")
+    
+    return games
+
+def scoreboard_url(target_date):
+    """Scoreboard URL for a YYYY-MM-DD date; yesterday uses the day=yesterday shortcut."""
+    yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+    if target_date == yesterday:
+        return f"{SCOREBOARD_URL}?day=yesterday"
+    return f"{SCOREBOARD_URL}?date={target_date}"
+
+def game_winners(games, target_date):
+    """
+    Turn parsed scoreboard games into winners, skipping upcoming, tied and unparsable games.
+    
+    Returns:
+        dict: Dictionary of game results with format
+              {game_index: {'winner': 'HOME'/'AWAY', 'away': str/None, 'home': str/None}}
+    """
+    game_results = {}
+
+    print(f"Found {len(games)} MLB game elements for date {target_date}.")
+
+    for game in games:
+        i = game["index"] - 1
+        away_score = game["away_score"]
+        home_score = game["home_score"]
+    
+        if game["status"] == "upcoming":
+            print(f"Game {i+1}: Not enough score elements found (upcoming game)")
+        elif away_score is not None and home_score is not None:
+            # Determine winner
+            if away_score > home_score:
+                winner = "AWAY"
+            elif home_score > away_score:
+                winner = "HOME"
+            else:
+                print(f"Tie game found for game {i+1} - skipping")
+                continue
+
+            # Store results in dictionary
+            game_results[i+1] = {
+                "winner": winner,
+                "away": game["away"],
+                "home": game["home"]
+            }
+        
+            print(f"Game {i+1}: {game['away']} {away_score} @ {game['home']} {home_score} -> Winner: {winner}")
+        else:
+            print(f"Game {i+1}: Could not extract valid scores - Away: {away_score}, Home: {home_score}")
 
-    driver.quit()
     return game_results
 
+def collect_game_results(dates):
+    """
+    Scrape MLB results for several dates in one browser, loading each scoreboard once.
+
+    If the stage runs past its deadline, the dates finished before then are
+    still returned; the rest stay pending for the next run.
+    
+    Args:
+        dates (list): Dates in YYYY-MM-DD format
+        
+    Returns:
+        dict: {date: {game_index: {...}}} as returned by game_winners
+    """
+    results_by_date = {}
+    if not dates:
+        return results_by_date
+
+    # Every date after the first gets one more page's worth of time
+    stage_deadline = STAGE_DEADLINE + PAGE_DEADLINE * (len(dates) - 1)
+    try:
+        with BrowserSupervisor(setup_ff_driver, "MLB results", stage_deadline=stage_deadline) as supervisor:
+            for target_date in dates:
+                driver = supervisor.load(scoreboard_url(target_date), ready=SCOREBOARD_READY)
+        
+                # Give the page time to load
+                time.sleep(3)
+        
+                results = game_winners(parse_scoreboard(driver), target_date)
+                # A scoreboard parsed while the watchdog killed the browser may be incomplete
+                if not supervisor.timed_out:
+                    results_by_date[target_date] = results
+    except StageDeadlineExceeded as e:
+        if not results_by_date:
+            raise
+        # The missing dates are still pending, so the next run scrapes them again
+        print(f"{e}; keeping results for {sorted(results_by_date)}, "
+              f"skipping {sorted(set(dates) - set(results_by_date))}.")
+
+    return results_by_date
+
+def update_game_results(specific_date=None):
+    """
+    Scrape MLB game results from Rotowire's scoreboard page.
+    
+    Args:
+        specific_date (str, optional): Date in YYYY-MM-DD format. Defaults to yesterday.
+        
+    Returns:
+        dict: Dictionary of game results as returned by game_winners
+    """
+    if specific_date:
+        target_date = specific_date
+    else:
+        yesterday = datetime.now() - timedelta(days=1)
+        target_date = yesterday.strftime('%Y-%m-%d')
+
+    return collect_game_results([target_date])[target_date]
+
 if __name__ == '__main__':
     print("Testing MLB game data collection...")
     update_game_results()
@@ -1,3 +1,4 @@
+import os
 import time
 from datetime import datetime, timedelta
 from selenium import webdriver
@@ -6,6 +7,21 @@ from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.firefox.options import Options
 from selenium.webdriver.firefox.service import Service
 
+from scrape_supervisor import BrowserSupervisor, PAGE_DEADLINE, STAGE_DEADLINE, StageDeadlineExceeded
+from lineup_details import extract_lineups
+
+# Overridable so the replay harness can serve recorded pages
+ROTOWIRE_BASE_URL = os.getenv('ROTOWIRE_BASE_URL', 'https://www.rotowire.com')
+
+# Game containers on the lineups page
+LINEUPS_XPATH = (
+    "//div[contains(@class, 'lineup is-nba') and "
+    "not(contains(@class, 'lineup is-nba is-tools')) and "
+    "not(contains(@class, 'is-deposit-offer')) and "
+    "not(contains(@class, 'lineup is-nba is-tools is-picks')) and "
+    "not(contains(@class, 'lineup-gdc'))]"
+)
+
 def setup_ff_driver():
     firefox_options = Options()
     firefox_options.add_argument('--headless')
@@ -13,101 +29,194 @@ def setup_ff_driver():
     driver = webdriver.Firefox(options=firefox_options, service=service)
     return driver
 
-def collect_nba_game_data():
-    driver = setup_ff_driver()
+def collect_nba_game_data(details=False):
+    # With details, each [game_index, away, home] row also carries both sides'
+    # lineup status and players, read in the same page pass
+    with BrowserSupervisor(setup_ff_driver, "NBA lineups") as supervisor:
+        # URL for NBA lineups on Rotowire
+        rotowire_url = f"{ROTOWIRE_BASE_URL}/basketball/nba-lineups.php"
+        driver = supervisor.load(rotowire_url, ready=(By.XPATH, LINEUPS_XPATH))
 
-    # URL for NBA lineups on Rotowire
-    rotowire_url = "https://www.rotowire.com/basketball/nba-lineups.php"
-    driver.get(rotowire_url)
+        # Xpath for game containers
+        game_elements = driver.find_elements(By.XPATH, LINEUPS_XPATH)
 
-    # Xpath for game containers
-    game_elements = driver.find_elements(
-        By.XPATH,
-        "//div[contains(@class, 'lineup is-nba') and "
-        "not(contains(@class, 'lineup is-nba is-tools')) and "
-        "not(contains(@class, 'is-deposit-offer')) and "
-        "not(contains(@class, 'lineup is-nba is-tools is-picks')) and "
-        "not(contains(@class, 'lineup-gdc'))]"
-    )
+        games_array = []  # To store structured game data
+        game_index = 1
 
-    games_array = []  # To store structured game data
-    game_index = 1
+        if details:
+            # One script call reads teams and lineups for every game
+            for away_team_text, home_team_text, lineups in extract_lineups(driver, game_elements):
+                games_array.append([game_index, away_team_text or "N/A", home_team_text or "N/A", lineups])
+                game_index += 1
+            return games_array
 
-    for game_element in game_elements:
-        try:
-            # Extract text from specific classes for away and home teams
-            away_team_text = game_element.find_element(By.CLASS_NAME, "lineup__team.is-visit").text
-            home_team_text = game_element.find_element(By.CLASS_NAME, "lineup__team.is-home").text
+        for game_element in game_elements:
+            try:
+                # Extract text from specific classes for away and home teams
+                away_team_text = game_element.find_element(By.CLASS_NAME, "lineup__team.is-visit").text
+                home_team_text = game_element.find_element(By.CLASS_NAME, "lineup__team.is-home").text
 
-        except Exception as e:
-            away_team_text = "N/A"
-            home_team_text = "N/A"
-            print(f"Error processing game {game_index}: {e}")
+            except Exception as e:
+                away_team_text = "N/A"
+                home_team_text = "N/A"
+                print(f"Error processing game {game_index}: {e}")
 
-        # Store the game data
-        game_row = [game_index, away_team_text, home_team_text]
-        games_array.append(game_row)
+            # Store the game data
+            game_row = [game_index, away_team_text, home_team_text]
+            games_array.append(game_row)
 
-        game_index += 1
+            game_index += 1
 
-    driver.quit()
     return games_array
 
-def update_game_results():
-    yesterday = datetime.now() - timedelta(days=1)
-    yesterday_date = yesterday.strftime('%Y-%m-%d')
-    url = f"https://www.rotowire.com/basketball/scoreboard.php?date={yesterday_date}"
-
-    driver = setup_ff_driver()
-    driver.get(url)
-
+# Rotowire NBA scoreboard, takes a ?date=YYYY-MM-DD parameter
+SCOREBOARD_URL = f"{ROTOWIRE_BASE_URL}/basketball/scoreboard.php"
+
+# Score columns on the scoreboard; .col used for games in OT
+SCORE_SELECTOR = ".col-2.align-c.bold, .col.align-c.bold"
+SCOREBOARD_READY = (By.CSS_SELECTOR, SCORE_SELECTOR)
+
+# Team links on a scoreboard game card, away team first
+TEAM_LINK_XPATH = ".//a[contains(@href, '/team')]"
+
+def scoreboard_teams(container):
+    """Away and home team abbreviations on a scoreboard game card, in lower case, or (None, None)."""
+    teams = []
+    for link in container.find_elements(By.XPATH, TEAM_LINK_XPATH):
+        # Logo and name links repeat the same team
+        team = link.text.strip().lower()
+        if team and team not in teams:
+            teams.append(team)
+    if len(teams) != 2:
+        return None, None
+    return teams[0], teams[1]
+
+def parse_scoreboard(driver):
     # Extract game score results
-    # .col used for games in OT
-    game_elements = driver.find_elements(By.CSS_SELECTOR, ".col-2.align-c.bold, .col.align-c.bold")
-    
-    game_results = {}
+    game_elements = driver.find_elements(By.CSS_SELECTOR, SCORE_SELECTOR)
+
+    games = []
 
-    # Print the number of game elements found
-    print(f"Found {len(game_elements)} game elements.")
-    
-    # Inspect each game_element
     for i, game in enumerate(game_elements):
-        print(f"Game {i+1}:")
-        
-        # Split the text content by the newline character
+        entry = {"index": i + 1, "away": None, "home": None, "away_score": None, "home_score": None,
+                 "status": "live", "text": ""}
+        games.append(entry)
+
         try:
             final_game_text = game.text.strip()
+            entry["text"] = final_game_text
             scores = final_game_text.split("\n")  # Split by newline
-            
+
             if len(scores) == 2:
-                # Convert away and home scores to integers
-                away_score = int(scores[0].strip())
-                home_score = int(scores[1].strip())
-                
-                if away_score > home_score:
-                    winner = "AWAY"
-                elif home_score >away_score:
-                    winner = "HOME"
-
-                # Store results in dictionary
-                game_results[i+1] = {
-                    "away_score": away_score,
-                    "home_score": home_score,
-                    "winner": winner
-                }
-                
-                print(f"Away score: {away_score}, Home score: {home_score}, Winner: {winner}")
-            else:
-                print(f"Error parsing scores for game {i+1}: {final_game_text}")
-        
+                entry["away_score"] = int(scores[0].strip())
+                entry["home_score"] = int(scores[1].strip())
+
+            # Status lives on the surrounding game card, not the score column
+            try:
+                container = game.find_element(By.XPATH, "./ancestor::div[contains(@class, 'col-4')][1]")
+            except NoSuchElementException:
+                container = game
+            if "Final" in container.text:
+                entry["status"] = "final"
+            if container is not game:
+                entry["away"], entry["home"] = scoreboard_teams(container)
+
         except Exception as e:
             print(f"Error while processing game {i+1}: {e}")
+
+    return games
+
+def game_winners(games):
+    """
+    Turn parsed scoreboard games into winners, skipping tied and unparsable games.
+
+    Returns:
+        dict: {game_index: {'away': str/None, 'home': str/None, 'away_score': int, 'home_score': int,
+                            'winner': 'HOME'/'AWAY'}}
+    """
+    game_results = {}
+
+    # Print the number of game elements found
+    print(f"Found {len(games)} game elements.")
+
+    # Inspect each game
+    for game in games:
+        i = game["index"] - 1
+        print(f"Game {i+1}:")
+
+        away_score = game["away_score"]
+        home_score = game["home_score"]
+
+        if away_score is not None and home_score is not None:
+            if away_score > home_score:
+                winner = "AWAY"
+            elif home_score > away_score:
+                winner = "HOME"
+            else:
+                print(f"Tie game found for game {i+1} - skipping")
+                print("-" * 50)
+                continue
+
+            # Store results in dictionary
+            game_results[i+1] = {
+                "away": game["away"],
+                "home": game["home"],
+                "away_score": away_score,
+                "home_score": home_score,
+                "winner": winner
+            }
         
+            print(f"Away score: {away_score}, Home score: {home_score}, Winner: {winner}")
+        else:
+            print(f"Error parsing scores for game {i+1}: {game['text']}")
+    
         print("-" * 50)
 
-    driver.quit()
     return game_results
 
+def collect_game_results(dates):
+    """
+    Scrape NBA results for several YYYY-MM-DD dates in one browser, loading each scoreboard once.
+
+    If the stage runs past its deadline, the dates finished before then are
+    still returned; the rest stay pending for the next run.
+
+    Returns:
+        dict: {date: {game_index: {...}}} as returned by game_winners
+    """
+    results_by_date = {}
+    if not dates:
+        return results_by_date
+
+    # Every date after the first gets one more page's worth of time
+    stage_deadline = STAGE_DEADLINE + PAGE_DEADLINE * (len(dates) - 1)
+    try:
+        with BrowserSupervisor(setup_ff_driver, "NBA results", stage_deadline=stage_deadline) as supervisor:
+            for target_date in dates:
+                driver = supervisor.load(f"{SCOREBOARD_URL}?date={target_date}", ready=SCOREBOARD_READY)
+                print(f"NBA scoreboard for {target_date}:")
+                results = game_winners(parse_scoreboard(driver))
+                # A scoreboard parsed while the watchdog killed the browser may be incomplete
+                if not supervisor.timed_out:
+                    results_by_date[target_date] = results
+    except StageDeadlineExceeded as e:
+        if not results_by_date:
+            raise
+        # The missing dates are still pending, so the next run scrapes them again
+        print(f"{e}; keeping results for {sorted(results_by_date)}, "
+              f"skipping {sorted(set(dates) - set(results_by_date))}.")
+
+    return results_by_date
+
+def update_game_results(specific_date=None):
+    if specific_date:
+        target_date = specific_date
+    else:
+        yesterday = datetime.now() - timedelta(days=1)
+        target_date = yesterday.strftime('%Y-%m-%d')
+
+    return collect_game_results([target_date])[target_date]
+
 if __name__ == '__main__':
     gr = update_game_results()
     print(f"gr: {gr}")
\ No newline at end of file
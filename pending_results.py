@@ -0,0 +1,269 @@
+import datetime
+import json
+import os
+
+import sheets_outbox
+from checkpoint import STATE_DIR
+from sheet_layout import find_blocks
+from sheets_retry import retry_with_backoff
+from token_cache import _file_lock
+
+# Games written to a sheet that do not have a winner yet, for every league
+PENDING_FILE = os.path.join(STATE_DIR, 'pending_results.json')
+
+# Stop re-checking a game this many days after its scoreboard date (postponed for good)
+PENDING_MAX_DAYS = int(os.getenv('PENDING_MAX_DAYS', '14'))
+
+def _load():
+    try:
+        with open(PENDING_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save(pending):
+    os.makedirs(os.path.dirname(PENDING_FILE), exist_ok=True)
+    tmp_path = f"{PENDING_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(pending, f)
+    os.replace(tmp_path, PENDING_FILE)
+
+def _update(league, change):
+    """Apply change(entries) -> entries to a league's list under the file lock."""
+    with _file_lock(f"{PENDING_FILE}.lock"):
+        pending = _load()
+        pending[league] = change(pending.get(league, []))
+        _save(pending)
+        return pending[league]
+
+def add_block(league, sheet_id, tab, block_date, results_date, start_row, games):
+    """
+    Record every game of a newly written block as pending.
+
+    Args:
+        league (str): League key
+        sheet_id (str): Spreadsheet ID
+        tab (str): Title of the tab the block was written to
+        block_date (str): Date in column A of the block, YYYY-MM-DD
+        results_date (str): Date of the scoreboard the games' results appear on, YYYY-MM-DD
+        start_row (int): 1-based row of the block's first game
+        games (list): [game_index, away, home] rows as written
+    """
+    new_entries = [{
+        'sheet_id': sheet_id, 'tab': tab, 'row': start_row + game[0] - 1,
+        'block_date': block_date, 'date': results_date,
+        'game': game[0], 'away': game[1].lower(), 'home': game[2].lower(),
+    } for game in games]
+
+    def change(entries):
+        # A rewritten block replaces whatever was pending for it
+        kept = [entry for entry in entries
+                if not (entry['sheet_id'] == sheet_id and entry['tab'] == tab and entry['block_date'] == block_date)]
+        return kept + new_entries
+
+    _update(league, change)
+
+def shift_rows(league, sheet_id, tab, from_row, count):
+    """Move pending rows at or below from_row down by count, after rows were inserted above them."""
+    def change(entries):
+        for entry in entries:
+            if entry['sheet_id'] == sheet_id and entry['tab'] == tab and entry['row'] >= from_row:
+                entry['row'] += count
+        return entries
+
+    _update(league, change)
+
+def pending_dates(league):
+    """
+    Scoreboard dates that still have games without a winner, oldest first.
+
+    Entries older than PENDING_MAX_DAYS are dropped here, with a message for
+    games that never got a result, so a game that was not made up stops
+    being re-checked after a couple of weeks.
+    """
+    cutoff = (datetime.date.today() - datetime.timedelta(days=PENDING_MAX_DAYS)).strftime('%Y-%m-%d')
+
+    def change(entries):
+        for entry in entries:
+            if entry['date'] < cutoff and not entry.get('resolved'):
+                print(f"Giving up on {league.upper()} game {entry['away']} @ {entry['home']} from {entry['date']} "
+                      f"(row {entry['row']} of '{entry['tab']}'), still no result after {PENDING_MAX_DAYS} days.")
+        return [entry for entry in entries if entry['date'] >= cutoff]
+
+    return sorted({entry['date'] for entry in _update(league, change) if not entry.get('resolved')})
+
+def tracks_date(league, sheet_id, results_date):
+    """Whether the sheet's games with results on results_date are tracked here, pending or resolved."""
+    return any(entry['sheet_id'] == sheet_id and entry['date'] == results_date
+               for entry in _load().get(league, []))
+
+def match_results(entries, results_by_date):
+    """
+    Pair tracked games with scoreboard results by their away and home teams.
+
+    A game takes a result for the same matchup on its own scoreboard date,
+    in game order so both halves of a doubleheader line up. Resolved entries
+    take part too, so a result that was already written is never handed to
+    another game. A game with no result on its own date (postponed,
+    suspended) then takes a result for its matchup on a later date that no
+    tracked game claimed, and is re-keyed to that date.
+
+    Results whose card showed no teams fall back to the game's position on
+    its own date's scoreboard. A date whose results match no tracked game at
+    all is reported with a warning, since that means the scoreboard and the
+    lineup pages name teams differently (see replay_harness.py check-teams).
+
+    Args:
+        entries (list): Tracked games of one sheet
+        results_by_date (dict): {YYYY-MM-DD: {game_index: {'winner', 'away', 'home'}}}, keys may be strings
+
+    Returns:
+        list: (entry, result) for every pending entry that has a result
+    """
+    by_matchup = {}
+    by_index = {}
+    for date in sorted(results_by_date):
+        # Keys may be strings after a checkpoint round-trip
+        results = {int(i): result for i, result in results_by_date[date].items()}
+        for index in sorted(results):
+            result = results[index]
+            if result.get('winner') not in ("AWAY", "HOME"):
+                continue
+            if result.get('away') and result.get('home'):
+                matchup = (result['away'].strip().lower(), result['home'].strip().lower())
+                by_matchup.setdefault(matchup, []).append((date, result))
+            else:
+                by_index[(date, index)] = result
+
+    def claim(entry, on_date):
+        candidates = by_matchup.get((entry['away'], entry['home']), [])
+        for position, (date, result) in enumerate(candidates):
+            if on_date(date):
+                del candidates[position]
+                return date, result
+        return None, None
+
+    matched = []
+    unmatched = []
+    claimed_dates = set()
+    for entry in sorted(entries, key=lambda entry: (entry['date'], entry['block_date'], entry['game'])):
+        date, result = claim(entry, lambda date: date == entry['date'])
+        if result:
+            claimed_dates.add(date)
+        else:
+            result = by_index.pop((entry['date'], entry['game']), None)
+        if entry.get('resolved'):
+            continue
+        if result:
+            matched.append((entry, result))
+        else:
+            unmatched.append(entry)
+
+    for entry in unmatched:
+        date, result = claim(entry, lambda date: date > entry['date'])
+        if result:
+            print(f"{entry['away']} @ {entry['home']} from {entry['date']} was played on {date}, re-keying it.")
+            claimed_dates.add(date)
+            entry['date'] = date
+            matched.append((entry, result))
+
+    tracked_dates = {entry['date'] for entry in entries}
+    for date in sorted(tracked_dates - claimed_dates):
+        scoreboard = [matchup for matchup, candidates in by_matchup.items() for candidate_date, _ in candidates
+                      if candidate_date == date]
+        if scoreboard:
+            sheet = sorted({(entry['away'], entry['home']) for entry in entries if entry['date'] == date})
+            print(f"WARNING: none of the {len(scoreboard)} results on the {date} scoreboard matched a tracked game "
+                  f"by team (scoreboard {sorted(scoreboard)[:3]}, sheet {sheet[:3]}). If the scoreboard and "
+                  f"the lineup pages name teams differently, no winners are written for this date.")
+
+    return matched
+
+@retry_with_backoff()
+def _open_spreadsheet(client, sheet_id):
+    return client.open_by_key(sheet_id)
+
+@retry_with_backoff()
+def _values_batch_get(spreadsheet, ranges):
+    return spreadsheet.values_batch_get(ranges)
+
+def write_pending_results(client, league, sheet_info, results_by_date):
+    """
+    Write the winner of every pending game on one sheet that now has a result.
+
+    Games are matched to results by their away and home teams (see
+    match_results), never by position on the scoreboard, so a postponed or
+    added game cannot shift a winner onto the wrong row. Tagged blocks are
+    located with one developerMetadata.search, so rows inserted above a
+    block since it was written do not matter. One batched read then checks
+    the rows still hold the teams that were written there (rows can be
+    edited by hand), and one batched write of column D across every tab is
+    queued in the outbox. Resolved games stay in the index, marked resolved,
+    until they expire; moved games are dropped; the rest are re-checked on
+    the next run.
+
+    Args:
+        client (gspread.Client): Authorized gspread client
+        league (str): League key
+        sheet_info (dict): Sheet information dictionary
+        results_by_date (dict): {YYYY-MM-DD: {game_index: {'winner': 'HOME'/'AWAY', 'away': str, 'home': str}}}.
+                                Keys may be strings after a checkpoint round-trip.
+
+    Returns:
+        int: Number of games resolved
+    """
+    sheet_id = sheet_info["sheet_id"]
+
+    decided = [(entry, result['winner']) for entry, result in match_results(
+        [entry for entry in _load().get(league, []) if entry['sheet_id'] == sheet_id], results_by_date)]
+    if not decided:
+        return 0
+
+    spreadsheet = _open_spreadsheet(client, sheet_id)
+    # Teams written by an earlier run may still be waiting in the outbox
+    sheets_outbox.drain(client, sheet_id)
+    blocks = find_blocks(spreadsheet, league, int(sheet_info["worksheet_GID"]),
+                         [entry['block_date'] for entry, _ in decided])
+    for entry, _ in decided:
+        if entry['block_date'] in blocks:
+            # Untagged blocks keep the row tracked through shift_rows
+            entry['row'] = blocks[entry['block_date']][1] + entry['game'] - 1
+
+    ranges = [f"'{entry['tab']}'!B{entry['row']}:C{entry['row']}" for entry, _ in decided]
+    value_ranges = _values_batch_get(spreadsheet, ranges).get('valueRanges', [])
+
+    data = []
+    resolved = {}
+    moved = set()
+    for (entry, winner), value_range in zip(decided, value_ranges):
+        key = (entry['tab'], entry['block_date'], entry['game'])
+        row = (value_range.get('values') or [[]])[0]
+        teams = [value.strip().lower() for value in row + [""] * (2 - len(row))]
+        if teams != [entry['away'], entry['home']]:
+            print(f"Row {entry['row']} of '{entry['tab']}' in {sheet_info['name']} no longer holds "
+                  f"{entry['away']} @ {entry['home']}, dropping it from pending results.")
+            moved.add(key)
+        else:
+            team = entry['away'] if winner == "AWAY" else entry['home']
+            data.append({'range': f"'{entry['tab']}'!D{entry['row']}", 'values': [[team]]})
+            print(f"Queued '{team}' to D{entry['row']} of '{entry['tab']}' ({entry['date']}) as the winner.")
+            resolved[key] = entry['date']
+
+    if data:
+        sheets_outbox.enqueue_values(sheet_id, data)
+
+    def change(entries):
+        kept = []
+        for entry in entries:
+            key = (entry['tab'], entry['block_date'], entry['game'])
+            if entry['sheet_id'] == sheet_id and key in moved:
+                continue
+            if entry['sheet_id'] == sheet_id and key in resolved:
+                # Keep the result's date so the game still claims it on later re-checks
+                entry.update(resolved=True, date=resolved[key])
+            kept.append(entry)
+        return kept
+
+    _update(league, change)
+    print(f"Resolved {len(data)} pending {league.upper()} results in {sheet_info['name']}.")
+    return len(data)
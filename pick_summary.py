@@ -0,0 +1,210 @@
+import argparse
+import datetime
+import importlib
+
+import numpy as np
+import pandas as pd
+
+import sheets_outbox
+from sheet_layout import FIRST_BLOCK_ROW, HEADER_ROWS, tab_id
+from sheets_retry import retry_with_backoff
+
+# Sheet module for each league, as in live_results.py
+LEAGUE_SHEETS = {"mlb": "mlb_gcp", "nba": "gcp_test"}
+
+# Columns of a game row: A date (first row of a block only), B away, C home,
+# D winner, E/F participant picks
+GAME_COLUMNS = ["date", "away", "home", "winner", "pick_1", "pick_2"]
+
+@retry_with_backoff()
+def _open_league_tab(client, sheet_info):
+    spreadsheet = client.open_by_key(sheet_info["sheet_id"])
+    return spreadsheet, spreadsheet.get_worksheet_by_id(int(sheet_info["worksheet_GID"]))
+
+@retry_with_backoff()
+def _list_worksheets(spreadsheet):
+    return spreadsheet.worksheets()
+
+@retry_with_backoff()
+def _values_batch_get(spreadsheet, ranges):
+    return spreadsheet.values_batch_get(ranges)
+
+@retry_with_backoff()
+def _spreadsheet_batch_update(spreadsheet, requests):
+    return spreadsheet.batch_update({'requests': requests})
+
+def history_tabs(spreadsheet, base_worksheet):
+    """The league tab plus any rotated '<tab> ...' tabs, excluding the index, summary and lineups."""
+    prefix = f"{base_worksheet.title} "
+    titles = [base_worksheet.title]
+    for worksheet in _list_worksheets(spreadsheet):
+        if worksheet.title.startswith(prefix) and not worksheet.title.endswith((" Index", " Summary", " Lineups")):
+            titles.append(worksheet.title)
+    return titles
+
+def read_history(spreadsheet, base_worksheet):
+    """
+    Read every history tab in a single values.batchGet call.
+
+    Returns:
+        tuple: (list of participant names from the header row, list of A:F rows from every tab)
+    """
+    titles = history_tabs(spreadsheet, base_worksheet)
+    response = _values_batch_get(spreadsheet, [f"'{title}'!A{HEADER_ROWS}:F" for title in titles])
+
+    participants = None
+    rows = []
+    for value_range in response.get('valueRanges', []):
+        values = value_range.get('values', [])
+        if not values:
+            continue
+        if participants is None:
+            header = values[0] + [""] * (len(GAME_COLUMNS) - len(values[0]))
+            participants = [header[4] or "Pick 1", header[5] or "Pick 2"]
+        rows.extend(values[FIRST_BLOCK_ROW - HEADER_ROWS:])
+    return participants or ["Pick 1", "Pick 2"], rows
+
+def build_games_frame(rows):
+    """
+    Turn raw A:F rows into one row per game with the block date filled in.
+
+    Blocks may be newest first (insert layout) or oldest first (appended
+    layouts); the frame is sorted chronologically either way.
+    """
+    frame = pd.DataFrame([row + [""] * (len(GAME_COLUMNS) - len(row)) for row in rows],
+                         columns=GAME_COLUMNS).astype(str)
+    frame = frame.apply(lambda column: column.str.strip())
+
+    # Only the first row of a block carries the date
+    frame["date"] = frame["date"].replace("", np.nan).ffill()
+    frame = frame[(frame["away"] != "") & (frame["home"] != "") & frame["date"].notna()].copy()
+
+    frame["row_order"] = np.arange(len(frame))
+    frame["date"] = pd.to_datetime(frame["date"], errors="coerce")
+    frame = frame.dropna(subset=["date"])
+    for column in ("away", "home", "winner", "pick_1", "pick_2"):
+        frame[column] = frame[column].str.lower()
+    # Keep the on-sheet game order within a block
+    frame["game"] = frame.groupby("date").cumcount()
+    return frame.sort_values(["date", "game"], kind="stable").reset_index(drop=True)
+
+def participant_summary(games, participants):
+    """
+    Accuracy and streaks per participant over decided games they picked.
+
+    Returns:
+        pd.DataFrame: Participant, Picks, Correct, Accuracy, Current Streak, Longest Streak.
+                      Current Streak is positive for a run of correct picks, negative for misses.
+    """
+    picks = games.melt(
+        id_vars=["date", "game", "winner"], value_vars=["pick_1", "pick_2"],
+        var_name="column", value_name="pick",
+    )
+    picks["participant"] = picks["column"].map({"pick_1": participants[0], "pick_2": participants[1]})
+    picks = picks[(picks["pick"] != "") & (picks["winner"] != "")]
+    picks = picks.sort_values(["participant", "date", "game"], kind="stable")
+    picks["correct"] = picks["pick"] == picks["winner"]
+
+    # Label runs of identical outcomes, then measure each run
+    new_run = picks["correct"].ne(picks.groupby("participant")["correct"].shift())
+    picks["run"] = new_run.groupby(picks["participant"]).cumsum()
+    picks["run_length"] = picks.groupby(["participant", "run"]).cumcount() + 1
+
+    grouped = picks.groupby("participant")
+    last = grouped.tail(1).set_index("participant")
+    summary = pd.DataFrame({
+        "Picks": grouped.size(),
+        "Correct": grouped["correct"].sum(),
+    })
+    summary["Accuracy"] = (summary["Correct"] / summary["Picks"]).round(3)
+    summary["Current Streak"] = np.where(last["correct"], last["run_length"], -last["run_length"])
+    summary["Longest Streak"] = (
+        picks["run_length"].where(picks["correct"], 0).groupby(picks["participant"]).max()
+    )
+    summary = summary.reindex(participants).fillna(0)
+    return summary.reset_index(names="Participant")
+
+def team_records(games):
+    """Wins, losses and win percentage for every team in a decided game."""
+    decided = games[games["winner"] != ""]
+    appearances = pd.concat([decided["away"], decided["home"]]).value_counts()
+    wins = decided["winner"].value_counts().reindex(appearances.index, fill_value=0)
+    records = pd.DataFrame({"Wins": wins, "Losses": appearances - wins})
+    records["Win %"] = (records["Wins"] / appearances).round(3)
+    records = records.sort_values(["Win %", "Wins"], ascending=False)
+    return records.reset_index(names="Team")
+
+def summary_block(participants_frame, teams_frame):
+    """Lay both tables out as one list of rows, starting at A1."""
+    updated = datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
+    rows = [["Pick accuracy", f"Updated {updated}"], list(participants_frame.columns)]
+    rows += participants_frame.values.tolist()
+    rows += [[], ["Team records"], list(teams_frame.columns)]
+    rows += teams_frame.values.tolist()
+    return rows
+
+def _cell(value):
+    if isinstance(value, (bool, np.bool_)):
+        return {'userEnteredValue': {'boolValue': bool(value)}}
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return {'userEnteredValue': {'numberValue': float(value)}}
+    return {'userEnteredValue': {'stringValue': str(value)}}
+
+def write_summary(spreadsheet, base_worksheet, rows):
+    """
+    Replace the '<tab> Summary' tab contents with rows in one batchUpdate.
+
+    updateCells over the whole tab writes the block and clears anything
+    left over from a longer previous summary in the same request.
+    """
+    title = f"{base_worksheet.title} Summary"
+    summary_id = tab_id(title)
+    requests = []
+    if not any(worksheet.id == summary_id for worksheet in _list_worksheets(spreadsheet)):
+        requests.append({'addSheet': {'properties': {'sheetId': summary_id, 'title': title}}})
+    requests.append({'updateCells': {
+        'range': {'sheetId': summary_id},
+        'rows': [{'values': [_cell(value) for value in row]} for row in rows],
+        'fields': 'userEnteredValue',
+    }})
+    _spreadsheet_batch_update(spreadsheet, requests)
+    print(f"Pick summary written to '{title}' ({len(rows)} rows).")
+
+def compute_summary(participants, rows):
+    games = build_games_frame(rows)
+    return summary_block(participant_summary(games, participants), team_records(games))
+
+def update_pick_summaries(sheets_info, client, history_csv=None):
+    """
+    Compute and write the pick summary for each sheet.
+
+    Args:
+        sheets_info (list): List of sheet information dictionaries
+        client (gspread.Client): Authorized gspread client
+        history_csv (str, optional): Local A:F export to use instead of reading the sheet
+    """
+    for sheet_info in sheets_info:
+        spreadsheet, base_worksheet = _open_league_tab(client, sheet_info)
+
+        if history_csv:
+            local = pd.read_csv(history_csv, header=None, dtype=str, keep_default_na=False)
+            participants = [local.iat[HEADER_ROWS - 1, 4] or "Pick 1", local.iat[HEADER_ROWS - 1, 5] or "Pick 2"]
+            rows = local.iloc[FIRST_BLOCK_ROW - 1:, :len(GAME_COLUMNS)].values.tolist()
+        else:
+            # Read the history only after this run's queued writes have landed
+            sheets_outbox.drain(client, sheet_info["sheet_id"])
+            participants, rows = read_history(spreadsheet, base_worksheet)
+
+        write_summary(spreadsheet, base_worksheet, compute_summary(participants, rows))
+
+def main():
+    parser = argparse.ArgumentParser(description="Write pick accuracy, streaks and team records to a summary tab.")
+    parser.add_argument("league", choices=sorted(LEAGUE_SHEETS), help="League to summarise")
+    parser.add_argument("--history-csv", help="Compute from a local A:F export instead of reading the sheet")
+    args = parser.parse_args()
+
+    sheets = importlib.import_module(LEAGUE_SHEETS[args.league])
+    update_pick_summaries(sheets.sheets_info, sheets.client, history_csv=args.history_csv)
+
+if __name__ == "__main__":
+    main()
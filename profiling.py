@@ -0,0 +1,269 @@
+import argparse
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# Where profile artifacts are written
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+# Stack sampling and child RSS sampling intervals in seconds
+STACK_SAMPLE_INTERVAL = 0.01
+RSS_SAMPLE_INTERVAL = 0.5
+
+# Number of entries kept in the JSON summary tables
+TOP_N = 25
+
+# Profilers of the worker threads of the current profile_run, None outside a run
+_thread_profilers = None
+_thread_profilers_lock = threading.Lock()
+
+def _child_processes_rss():
+    """
+    Return {pid: (name, rss_bytes)} for every descendant of this process.
+
+    Reads /proc directly, so geckodriver and the Firefox processes it spawns
+    are included. Returns an empty dict on platforms without /proc.
+    """
+    if not os.path.isdir('/proc'):
+        return {}
+
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    children = {}
+    names = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # The command name is in parentheses and may itself contain spaces
+        close_paren = stat.rindex(')')
+        pid = int(entry)
+        names[pid] = stat[stat.index('(') + 1:close_paren]
+        ppid = int(stat[close_paren + 2:].split()[1])
+        children.setdefault(ppid, []).append(pid)
+
+    result = {}
+    pending = list(children.get(os.getpid(), []))
+    while pending:
+        pid = pending.pop()
+        pending.extend(children.get(pid, []))
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                rss_pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        result[pid] = (names.get(pid, '?'), rss_pages * page_size)
+    return result
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+class _Sampler(threading.Thread):
+    """Background thread that samples Python stacks and child process RSS."""
+
+    def __init__(self):
+        super().__init__(name='profiler-sampler', daemon=True)
+        self.stacks = Counter()
+        self.rss_timeline = []
+        self._stop_event = threading.Event()
+        self._start_time = time.perf_counter()
+
+    def run(self):
+        next_rss_sample = 0.0
+        while not self._stop_event.is_set():
+            now = time.perf_counter() - self._start_time
+            own_ident = threading.get_ident()
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(thread_names.get(ident, f'thread-{ident}'))
+                self.stacks[';'.join(reversed(labels))] += 1
+
+            if now >= next_rss_sample:
+                processes = _child_processes_rss()
+                self.rss_timeline.append({
+                    'seconds': round(now, 2),
+                    'total_rss_bytes': sum(rss for _, rss in processes.values()),
+                    'processes': {f"{name}[{pid}]": rss for pid, (name, rss) in processes.items()},
+                })
+                next_rss_sample = now + RSS_SAMPLE_INTERVAL
+
+            self._stop_event.wait(STACK_SAMPLE_INTERVAL)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+@contextmanager
+def profile_thread():
+    """
+    Profile the enclosed block on a worker thread into the current profile_run.
+
+    cProfile only sees the thread that enabled it, so work handed to a
+    thread pool (e.g. StagePipeline stages) wraps itself in this to show up
+    in the run's .prof file and top_functions. Does nothing outside a run.
+    """
+    with _thread_profilers_lock:
+        profilers = _thread_profilers
+    if profilers is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _thread_profilers_lock:
+            profilers.append(profiler)
+
+def _top_functions(stats):
+    rows = []
+    for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f"{os.path.basename(filename)}:{line}:{function}",
+            'ncalls': ncalls,
+            'tottime': round(tottime, 4),
+            'cumtime': round(cumtime, 4),
+        })
+    rows.sort(key=lambda row: row['cumtime'], reverse=True)
+    return rows[:TOP_N]
+
+def _top_allocations(snapshot):
+    return [
+        {
+            'location': f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+            'size_bytes': stat.size,
+            'count': stat.count,
+        }
+        for stat in snapshot.statistics('lineno')[:TOP_N]
+    ]
+
+@contextmanager
+def profile_run(name, enabled=True, output_dir=None):
+    """
+    Profile the enclosed block and write artifacts when it exits.
+
+    cProfile covers the calling thread plus any worker thread that runs
+    inside profile_thread(); the .folded sampler covers every thread.
+
+    Writes three files to output_dir (PROFILE_DIR by default):
+        <name>-<timestamp>.prof    cProfile stats, loadable with pstats/snakeviz
+        <name>-<timestamp>.folded  sampled stacks in folded format for flamegraph.pl/speedscope
+        <name>-<timestamp>.json    summary of CPU, tracemalloc and child Firefox RSS
+
+    Args:
+        name (str): Prefix for the artifact files (e.g. "mlb")
+        enabled (bool): When False the block runs without any profiling
+        output_dir (str, optional): Directory for the artifacts
+    """
+    if not enabled:
+        yield
+        return
+
+    output_dir = output_dir or PROFILE_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    started_at = datetime.datetime.now()
+    prefix = os.path.join(output_dir, f"{name}-{started_at:%Y%m%d-%H%M%S}")
+
+    tracemalloc.start()
+    sampler = _Sampler()
+    profiler = cProfile.Profile()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    global _thread_profilers
+    with _thread_profilers_lock:
+        _thread_profilers = thread_profilers = []
+
+    sampler.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _thread_profilers_lock:
+            _thread_profilers = None
+        wall_seconds = time.perf_counter() - wall_start
+        cpu_seconds = time.process_time() - cpu_start
+        sampler.stop()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        # Merge the worker threads' profiles into the main thread's
+        stats = pstats.Stats(profiler)
+        for thread_profiler in thread_profilers:
+            stats.add(thread_profiler)
+        stats.dump_stats(f"{prefix}.prof")
+
+        with open(f"{prefix}.folded", 'w') as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        peak_child = max(sampler.rss_timeline, key=lambda sample: sample['total_rss_bytes'], default=None)
+        summary = {
+            'name': name,
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'wall_seconds': round(wall_seconds, 3),
+            'cpu_seconds': round(cpu_seconds, 3),
+            # Time the main process spent waiting on geckodriver, Firefox or the network
+            'off_cpu_seconds': round(max(wall_seconds - cpu_seconds, 0), 3),
+            'top_functions': _top_functions(stats),
+            'tracemalloc_peak_bytes': peak_bytes,
+            'top_allocations': _top_allocations(snapshot),
+            'child_peak_rss_bytes': peak_child['total_rss_bytes'] if peak_child else 0,
+            'child_rss_timeline': sampler.rss_timeline,
+        }
+        with open(f"{prefix}.json", 'w') as f:
+            json.dump(summary, f, indent=2)
+
+        print(f"Profile written to {prefix}.{{prof,folded,json}} "
+              f"(wall {wall_seconds:.1f}s, cpu {cpu_seconds:.1f}s, "
+              f"python peak {peak_bytes / 2**20:.1f} MiB, "
+              f"browser peak {summary['child_peak_rss_bytes'] / 2**20:.1f} MiB)")
+
+def diff_summaries(before_path, after_path):
+    """Print how the headline numbers and top functions changed between two JSON summaries."""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    for key in ('wall_seconds', 'cpu_seconds', 'off_cpu_seconds', 'tracemalloc_peak_bytes', 'child_peak_rss_bytes'):
+        old, new = before.get(key, 0), after.get(key, 0)
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{key:<24} {old:>14} -> {new:<14} {change}")
+
+    print("\nTop functions by cumulative time:")
+    old_cumtime = {row['function']: row['cumtime'] for row in before.get('top_functions', [])}
+    for row in after.get('top_functions', []):
+        old = old_cumtime.get(row['function'])
+        old_text = f"{old:.3f}" if old is not None else "-"
+        print(f"  {row['function']:<60} {old_text:>10} -> {row['cumtime']:.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two profile summaries.")
+    parser.add_argument("before", help="Earlier <name>-<timestamp>.json summary")
+    parser.add_argument("after", help="Later <name>-<timestamp>.json summary")
+    args = parser.parse_args()
+    diff_summaries(args.before, args.after)
@@ -0,0 +1,577 @@
+import argparse
+import datetime
+import gc
+import importlib
+import io
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+from collections import defaultdict
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from fake_sheets import FakeSheetsServer
+
+# Recorded pages, stored by URL path (query strings are ignored on replay)
+REPLAY_DIR = os.getenv('REPLAY_DIR', 'replay')
+PAGES_DIR = os.path.join(REPLAY_DIR, 'pages')
+DEFAULT_BUDGET = os.path.join(REPLAY_DIR, 'budget.json')
+
+# League sheet module, scraper functions patched in synthetic mode and tab title
+LEAGUES = {
+    "mlb": {"module": "mlb_gcp", "scrapers": ("collect_mlb_game_data", "collect_game_results"), "tab": "MLB"},
+    "nba": {"module": "gcp_test", "scrapers": ("collect_nba_game_data", "collect_game_results"), "tab": "NBA"},
+    "ufc": {"module": "ufc_gcp", "scrapers": ("collect_ufc_fight_data",), "tab": "UFC"},
+}
+
+# Pages fetched by `record`; the UFC event page comes from UFC_URL
+ROTOWIRE_PAGES = [
+    "/baseball/daily-lineups.php",
+    "/baseball/scoreboard.php?day=yesterday",
+    "/basketball/nba-lineups.php",
+    "/basketball/scoreboard.php",
+]
+UFC_REPLAY_PATH = "/ufc/event"
+
+HEADER_ROWS = [["Date", "Away", "Home", "Winner", "Picks", "Picks"],
+               ["", "", "", "", "Player 1", "Player 2"]]
+
+TEAMS = ["ari", "atl", "bal", "bos", "chc", "cin", "cle", "col", "det", "hou",
+         "kc", "laa", "lad", "mia", "mil", "min", "nym", "nyy", "oak", "phi"]
+
+class ReplaySiteServer:
+    """
+    Serve recorded Rotowire and UFC pages from PAGES_DIR with injectable latency and errors.
+
+    An injected error closes the connection without a response, which Firefox
+    reports as a network error page and Selenium raises on, so it goes
+    through the same retry path as a real dropped connection.
+    """
+
+    def __init__(self, pages_dir=PAGES_DIR, latency=0.0, error_rate=0.0, seed=None):
+        self.pages_dir = pages_dir
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.injected_errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+    def _handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with site._lock:
+                    site.requests += 1
+                    fail = site._random.random() < site.error_rate
+                    if fail:
+                        site.injected_errors += 1
+                if site.latency:
+                    time.sleep(site.latency)
+                if fail:
+                    self.close_connection = True
+                    return
+
+                path = os.path.normpath(urlsplit(self.path).path).lstrip('/')
+                page = os.path.join(site.pages_dir, path)
+                if not os.path.isfile(page):
+                    self.send_error(404, f"No recorded page for /{path}")
+                    return
+                with open(page, 'rb') as f:
+                    data = f.read()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def record_pages(pages_dir=PAGES_DIR):
+    """Fetch the live pages the scrapers load and store them for replay."""
+    import requests
+
+    from mlb_scraper import ROTOWIRE_BASE_URL
+
+    urls = [(f"{ROTOWIRE_BASE_URL}{path}", urlsplit(path).path) for path in ROTOWIRE_PAGES]
+    if os.getenv('UFC_URL'):
+        urls.append((os.getenv('UFC_URL'), UFC_REPLAY_PATH))
+
+    session = requests.Session()
+    session.headers['User-Agent'] = 'Mozilla/5.0 (X11; Linux x86_64; rv:128.0) Gecko/20100101 Firefox/128.0'
+    for url, path in urls:
+        response = session.get(url, timeout=30)
+        response.raise_for_status()
+        page = os.path.join(pages_dir, path.lstrip('/'))
+        os.makedirs(os.path.dirname(page), exist_ok=True)
+        with open(page, 'wb') as f:
+            f.write(response.content)
+        print(f"Recorded {url} -> {page} ({len(response.content)} bytes)")
+
+def check_recorded_teams(pages_dir=PAGES_DIR):
+    """
+    Check that the recorded scoreboards name teams the way the lineup pages do.
+
+    Pending results are matched to sheet rows by the scoreboard's team text,
+    which has to equal the lineup text written to columns B:C. This drives
+    Firefox through the real scrapers against the recorded pages.
+
+    Returns:
+        list: Problems found, empty when every scoreboard card shows two
+              teams and they use the lineup pages' abbreviations
+    """
+    from scrape_supervisor import BrowserSupervisor
+
+    problems = []
+    with ReplaySiteServer(pages_dir) as site:
+        os.environ['ROTOWIRE_BASE_URL'] = site.url
+        for league, scraper_name, lineups_name in (("mlb", "mlb_scraper", "collect_mlb_game_data"),
+                                                   ("nba", "nba_scraper", "collect_nba_game_data")):
+            # Reload so the scraper's URLs point at the replay site
+            scraper = importlib.reload(importlib.import_module(scraper_name))
+            lineup_teams = {team.strip().lower() for row in getattr(scraper, lineups_name)() for team in row[1:3]}
+            with BrowserSupervisor(scraper.setup_ff_driver, f"{league.upper()} scoreboard teams") as supervisor:
+                games = scraper.parse_scoreboard(supervisor.load(scraper.SCOREBOARD_URL, ready=scraper.SCOREBOARD_READY))
+
+            teamless = [game["index"] for game in games if not (game["away"] and game["home"])]
+            scoreboard_teams = {game[side] for game in games for side in ("away", "home") if game[side]}
+            unknown = sorted(scoreboard_teams - lineup_teams)
+            if not games:
+                problems.append(f"{league.upper()}: no games on the recorded scoreboard")
+            if teamless:
+                problems.append(f"{league.upper()}: scoreboard games {teamless} show no teams")
+            if scoreboard_teams and not scoreboard_teams & lineup_teams:
+                problems.append(f"{league.upper()}: no scoreboard team matches a lineup team "
+                                f"(scoreboard {unknown[:5]}, lineups {sorted(lineup_teams)[:5]})")
+            print(f"{league.upper()}: {len(games)} scoreboard games, {len(scoreboard_teams & lineup_teams)} teams "
+                  f"also on the lineups page" + (f", not on it: {unknown}" if unknown else ""))
+    return problems
+
+def _write_service_account(directory):
+    """Write a throwaway service account key; its token is pre-seeded so it is never exchanged."""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode('utf-8')
+    path = os.path.join(directory, 'service_account.json')
+    with open(path, 'w') as f:
+        json.dump({
+            'type': 'service_account',
+            'project_id': 'replay',
+            'private_key_id': 'replay',
+            'private_key': pem,
+            'client_email': 'replay@replay.iam.gserviceaccount.com',
+            'client_id': '0',
+            'token_uri': 'http://127.0.0.1:9/token',
+        }, f)
+    return path
+
+def _seed_token(credentials_path):
+    from token_cache import CachedCredentials, _write_cached_token
+
+    credentials = CachedCredentials.from_service_account_file(
+        credentials_path, scopes=['https://www.googleapis.com/auth/spreadsheets'])
+    cache_path = credentials._token_cache_path()
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    _write_cached_token(cache_path, 'replay-token', datetime.datetime(2099, 1, 1))
+
+def _synthetic_scrapers(league, games, latency, seed, today):
+    """
+    Stand-ins returning data shaped like each scraper's output, after latency seconds.
+
+    today() gives the simulated date; each day's lineups become that date's
+    scoreboard, so results carry the teams that were written to the sheets.
+    """
+    # Separate generators, since the stage pipeline may run the scrapes concurrently
+    lineup_rng = random.Random(f"{seed}-{league}-lineups")
+    results_rng = random.Random(f"{seed}-{league}-results")
+    schedule = {}
+
+    def side(team):
+        # Nine batters plus a starting pitcher, in the scraper's compact form
+        players = [["SP", "P", f"{team} pitcher", lineup_rng.choice(["L", "R"])]]
+        players += [[order, lineup_rng.choice(["C", "1B", "2B", "SS", "3B", "LF", "CF", "RF", "DH"]),
+                     f"{team} player {order}", lineup_rng.choice(["L", "R", "S"])] for order in range(1, 10)]
+        return [lineup_rng.choice(["confirmed", "expected"]), players]
+
+    def lineups(details=False):
+        time.sleep(latency)
+        teams = lineup_rng.sample(TEAMS, min(games * 2, len(TEAMS)))
+        teams += [f"t{i}" for i in range(games * 2 - len(teams))]
+        rows = [[i + 1, teams[2 * i], teams[2 * i + 1]] for i in range(games)]
+        schedule[today()] = [(row[1], row[2]) for row in rows]
+        if details:
+            for row in rows:
+                row.append({"away": side(row[1]), "home": side(row[2])})
+        return rows
+
+    def results(dates):
+        # One scoreboard load per date; about one game in ten is still undecided
+        results_by_date = {}
+        for date in dates:
+            time.sleep(latency)
+            matchups = schedule.get(date) or [(f"a{i}", f"h{i}") for i in range(games)]
+            results_by_date[date] = {i + 1: {"winner": results_rng.choice(["AWAY", "HOME"]), "away": away, "home": home}
+                                     for i, (away, home) in enumerate(matchups) if results_rng.random() >= 0.1}
+        return results_by_date
+
+    def fights(ufc_url=None):
+        time.sleep(latency)
+        return [{"fight_index": i + 1, "fighter_1": f"fighter {2 * i}", "fighter_2": f"fighter {2 * i + 1}"}
+                for i in range(games)]
+
+    if league == "ufc":
+        return {"collect_ufc_fight_data": fights}
+    lineup_name, results_name = LEAGUES[league]["scrapers"]
+    return {lineup_name: lineups, results_name: results}
+
+def _shifted_clock(days):
+    """A stand-in for the datetime module whose now() and today() are days ahead."""
+    offset = datetime.timedelta(days=days)
+
+    class ShiftedDatetime(datetime.datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return datetime.datetime.now(tz) + offset
+
+    class ShiftedDate(datetime.date):
+        @classmethod
+        def today(cls):
+            return datetime.date.today() + offset
+
+    return types.SimpleNamespace(datetime=ShiftedDatetime, date=ShiftedDate, timedelta=datetime.timedelta,
+                                 timezone=datetime.timezone)
+
+# Modules whose dates follow the simulated day (they all `import datetime`)
+CLOCK_MODULES = ("checkpoint", "pending_results", "pick_summary")
+
+class _StageRecorder:
+    """checkpoint.STAGE_LISTENERS callback collecting per-stage wall times."""
+
+    def __init__(self):
+        self.current = []
+
+    def __call__(self, league, stage, seconds, skipped):
+        self.current.append({"stage": stage, "seconds": round(seconds, 4), "skipped": skipped})
+
+class _RetryCounter:
+    """retry_with_backoff and BrowserSupervisor listener counting the retries actually made."""
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def sheets(self, func_name, attempt, error):
+        with self._lock:
+            self.counts["sheets"] += 1
+
+    def page_load(self, stage_name, url, attempt, error):
+        with self._lock:
+            self.counts["page_load"] += 1
+
+def _stage_kind(stage):
+    # write_games-<sheet name> -> write_games, so budgets do not depend on sheet names
+    return stage.split('-', 1)[0]
+
+def run_scenario(leagues, sheets, days, scrape="synthetic", games=12, layout="insert",
+                 site_latency=0.0, site_error_rate=0.0, sheets_latency=0.0, sheets_error_rate=0.0,
+                 retry_delay=0.01, pick_summary=False, lineup_details=False, seed=0, verbose=False):
+    """
+    Run every league's real main() for days consecutive runs against local fakes.
+
+    The fake Sheets server and, in replay mode, the site server are started
+    first and the pipeline modules are imported afterwards, so their
+    module-level settings (endpoints, state directory, token cache) pick up
+    the harness environment. Each day is one nightly run against the sheet
+    state left by the previous day, with the pipeline's clock moved forward
+    one day per run so dates, checkpoints and pending results advance.
+
+    Args:
+        leagues (list): League keys from LEAGUES
+        sheets (int): Target sheets per league (UFC always writes one sheet)
+        days (int): Number of consecutive runs
+        scrape (str): "replay" to drive Firefox against recorded pages, "synthetic" to skip the browser
+        games (int): Games per day in synthetic mode
+        layout (str): Sheet layout for MLB and NBA sheets
+
+    Returns:
+        dict: Report with per-stage wall times, API calls, retries and peak memory
+    """
+    workdir = tempfile.mkdtemp(prefix='replay-')
+    credentials_path = _write_service_account(workdir)
+    report = {
+        "scenario": {"leagues": leagues, "sheets": sheets, "days": days, "scrape": scrape, "games": games,
+                     "layout": layout, "site_latency": site_latency, "site_error_rate": site_error_rate,
+                     "sheets_latency": sheets_latency, "sheets_error_rate": sheets_error_rate,
+                     "lineup_details": lineup_details},
+        "runs": [],
+        "failures": [],
+    }
+
+    with FakeSheetsServer(latency=sheets_latency, error_rate=sheets_error_rate, seed=seed) as sheets_server, \
+            ReplaySiteServer(latency=site_latency, error_rate=site_error_rate, seed=seed) as site:
+        sheet_ids = {}
+        for league in leagues:
+            count = 1 if league == "ufc" else sheets
+            sheet_ids[league] = [f"replay-{league}-{i + 1}" for i in range(count)]
+            for sheet_id in sheet_ids[league]:
+                sheets_server.add_spreadsheet(sheet_id, [LEAGUES[league]["tab"]], header_rows=HEADER_ROWS)
+
+        os.environ.update({
+            'SHEETS_API_ENDPOINT': sheets_server.url,
+            'ROTOWIRE_BASE_URL': site.url,
+            'UFC_URL': f"{site.url}{UFC_REPLAY_PATH}",
+            'STATE_DIR': os.path.join(workdir, 'state'),
+            'TOKEN_CACHE_DIR': os.path.join(workdir, 'tokens'),
+            'JSON_CREDENTIALS': credentials_path,
+            'RETRY_INITIAL_DELAY': str(retry_delay),
+            'SHEET_LAYOUT': layout,
+            'PICK_SUMMARY': '1' if pick_summary else '0',
+            'LINEUP_DETAILS': '1' if lineup_details else '0',
+        })
+        if "ufc" in sheet_ids:
+            os.environ.update({'SHEET_ID': sheet_ids["ufc"][0], 'WORKSHEET_GID': '0'})
+        _seed_token(credentials_path)
+
+        import checkpoint
+        import scrape_supervisor
+        import sheets_retry
+        recorder = _StageRecorder()
+        checkpoint.STAGE_LISTENERS.append(recorder)
+        retry_counter = _RetryCounter()
+        sheets_retry.RETRY_LISTENERS.append(retry_counter.sheets)
+        scrape_supervisor.LOAD_RETRY_LISTENERS.append(retry_counter.page_load)
+
+        tracemalloc.start()
+        wall_start = time.perf_counter()
+        try:
+            modules = {}
+            for league in leagues:
+                with redirect_stdout(io.StringIO()):
+                    module = importlib.import_module(LEAGUES[league]["module"])
+                if league != "ufc":
+                    module.sheets_info = [
+                        {"sheet_id": sheet_id, "worksheet_GID": "0", "name": f"Sheet {i + 1}", "layout": layout}
+                        for i, sheet_id in enumerate(sheet_ids[league])
+                    ]
+                if scrape == "synthetic":
+                    today = lambda module=module: module.datetime.datetime.now().strftime('%Y-%m-%d')
+                    for name, func in _synthetic_scrapers(league, games, site_latency, seed, today).items():
+                        setattr(module, name, func)
+                modules[league] = module
+
+            for day in range(1, days + 1):
+                clock = _shifted_clock(day - 1)
+                for name in CLOCK_MODULES:
+                    importlib.import_module(name).datetime = clock
+                for league, module in modules.items():
+                    module.datetime = clock
+                    recorder.current = []
+                    log = io.StringIO()
+                    # Collect garbage from the previous run so peaks are comparable between runs
+                    gc.collect()
+                    tracemalloc.reset_peak()
+                    started = time.perf_counter()
+                    error = None
+                    try:
+                        with redirect_stdout(sys.stdout if verbose else log):
+                            if league == "ufc":
+                                module.main()
+                            else:
+                                module.main(fresh=True)
+                    except Exception as e:
+                        error = f"{type(e).__name__}: {e}"
+                    seconds = time.perf_counter() - started
+                    _, peak = tracemalloc.get_traced_memory()
+
+                    stages = recorder.current or [{"stage": "main", "seconds": round(seconds, 4), "skipped": False}]
+                    report["runs"].append({"league": league, "day": day, "seconds": round(seconds, 4),
+                                           "peak_python_bytes": peak, "stages": stages, "error": error})
+                    if error:
+                        report["failures"].append({"league": league, "day": day, "error": error,
+                                                   "log_tail": log.getvalue().splitlines()[-20:]})
+                    print(f"Day {day} {league.upper()}: {seconds:.2f}s, python peak {peak / 2**20:.1f} MiB"
+                          + (f", FAILED ({error})" if error else ""))
+        finally:
+            wall_seconds = time.perf_counter() - wall_start
+            tracemalloc.stop()
+            checkpoint.STAGE_LISTENERS.remove(recorder)
+            sheets_retry.RETRY_LISTENERS.remove(retry_counter.sheets)
+            scrape_supervisor.LOAD_RETRY_LISTENERS.remove(retry_counter.page_load)
+
+        stage_seconds = defaultdict(float)
+        for run in report["runs"]:
+            for stage in run["stages"]:
+                for key in (_stage_kind(stage["stage"]), f"{run['league']}.{_stage_kind(stage['stage'])}"):
+                    stage_seconds[key] = max(stage_seconds[key], stage["seconds"])
+
+        calls_by_league = defaultdict(int)
+        for sheet_id, count in sheets_server.calls_by_spreadsheet.items():
+            calls_by_league[sheet_id.split('-')[1]] += count
+
+        report.update({
+            "total_seconds": round(wall_seconds, 3),
+            # Worst single run of each stage kind, overall and per league
+            "stage_seconds": dict(sorted(stage_seconds.items())),
+            "api_calls": sum(sheets_server.calls.values()),
+            "api_calls_by_method": dict(sheets_server.calls),
+            "api_calls_by_league": dict(calls_by_league),
+            # Retries made by retry_with_backoff and by BrowserSupervisor page loads
+            "retries": sum(retry_counter.counts.values()),
+            "retries_by_kind": dict(retry_counter.counts),
+            "injected_errors": sum(sheets_server.injected_errors.values()) + site.injected_errors,
+            "site_requests": site.requests,
+            "peak_python_mb": round(max((run["peak_python_bytes"] for run in report["runs"]), default=0) / 2**20, 2),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        })
+    return report
+
+def check_budget(report, budget):
+    """
+    Compare a report against a budget and return the list of regressions.
+
+    Budget keys: total_seconds, api_calls, retries and peak_python_mb are upper
+    bounds on the report values; stage_seconds maps a stage kind
+    ("write_games") or league stage ("mlb.write_games") to its worst allowed
+    single run. Any failed run is always a regression. A "scenario" key only
+    records which run the budget was set for. Scenarios that inject errors
+    are expected to retry, so their retries are not held to the budget.
+    """
+    regressions = [f"{failure['league']} day {failure['day']} failed: {failure['error']}"
+                   for failure in report["failures"]]
+    scenario = report["scenario"]
+    fault_injection = scenario["site_error_rate"] > 0 or scenario["sheets_error_rate"] > 0
+    for key in ("total_seconds", "api_calls", "retries", "peak_python_mb"):
+        if key == "retries" and fault_injection:
+            continue
+        if key in budget and report[key] > budget[key]:
+            regressions.append(f"{key} {report[key]} exceeds budget {budget[key]}")
+    for stage, limit in budget.get("stage_seconds", {}).items():
+        seconds = report["stage_seconds"].get(stage)
+        if seconds is not None and seconds > limit:
+            regressions.append(f"stage {stage} took {seconds:.3f}s, budget {limit}s")
+    return regressions
+
+def print_report(report):
+    print(f"\nTotal {report['total_seconds']:.2f}s, {report['api_calls']} Sheets API calls, "
+          f"{report['retries']} retries ({report['injected_errors']} injected errors), python peak {report['peak_python_mb']} MiB, max RSS {report['max_rss_mb']} MiB")
+    print("Worst stage wall times:")
+    for stage, seconds in report["stage_seconds"].items():
+        if '.' not in stage:
+            print(f"  {stage:<20} {seconds:8.3f}s")
+    print("Sheets API calls by method:")
+    for method, count in sorted(report["api_calls_by_method"].items()):
+        print(f"  {method:<26} {count:6d}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay the scraping and Sheets pipeline against local fakes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("record", help=f"Record the live pages the scrapers load into {PAGES_DIR}")
+    subparsers.add_parser("check-teams", help="Check the recorded scoreboards use the lineup pages' team names")
+
+    run = subparsers.add_parser("run", help="Run a replay scenario and check it against a budget")
+    run.add_argument("--leagues", default="mlb,nba", help="Comma-separated leagues (mlb, nba, ufc)")
+    run.add_argument("--sheets", type=int, default=2, help="Target sheets per league")
+    run.add_argument("--days", type=int, default=3, help="Consecutive nightly runs")
+    run.add_argument("--scrape", choices=["replay", "synthetic"], default="synthetic",
+                     help="Drive Firefox against recorded pages, or return synthetic games without a browser")
+    run.add_argument("--games", type=int, default=12, help="Games per day in synthetic mode")
+    run.add_argument("--layout", default="insert", help="SHEET_LAYOUT for MLB and NBA sheets")
+    run.add_argument("--site-latency", type=float, default=0.0, help="Seconds added to every page load")
+    run.add_argument("--site-error-rate", type=float, default=0.0, help="Fraction of page loads that drop the connection")
+    run.add_argument("--sheets-latency", type=float, default=0.0, help="Seconds added to every Sheets API call")
+    run.add_argument("--sheets-error-rate", type=float, default=0.0, help="Fraction of Sheets API calls answered with a 503")
+    run.add_argument("--retry-delay", type=float, default=0.01, help="RETRY_INITIAL_DELAY for the run")
+    run.add_argument("--pick-summary", action="store_true", help="Also run the pick summary stage")
+    run.add_argument("--lineup-details", action="store_true", help="Also capture and write player-level lineups")
+    run.add_argument("--seed", type=int, default=0, help="Seed for synthetic games and error injection")
+    run.add_argument("--budget", help=f"Budget JSON to enforce (default {DEFAULT_BUDGET} if present)")
+    run.add_argument("--report", help="Write the full report JSON here")
+    run.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    if args.command in ("record", "check-teams"):
+        # A recording is only kept if the scoreboards can be matched to the lineups
+        if args.command == "record":
+            record_pages()
+        problems = check_recorded_teams()
+        for problem in problems:
+            print(f"  {problem}")
+        if problems:
+            sys.exit(1)
+        return
+
+    leagues = [league.strip() for league in args.leagues.split(',') if league.strip()]
+    unknown = [league for league in leagues if league not in LEAGUES]
+    if unknown:
+        parser.error(f"Unknown leagues: {', '.join(unknown)}")
+
+    report = run_scenario(
+        leagues, args.sheets, args.days, scrape=args.scrape, games=args.games, layout=args.layout,
+        site_latency=args.site_latency, site_error_rate=args.site_error_rate,
+        sheets_latency=args.sheets_latency, sheets_error_rate=args.sheets_error_rate,
+        retry_delay=args.retry_delay, pick_summary=args.pick_summary, lineup_details=args.lineup_details,
+        seed=args.seed, verbose=args.verbose,
+    )
+    print_report(report)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.report}")
+
+    budget_path = args.budget or (DEFAULT_BUDGET if os.path.exists(DEFAULT_BUDGET) else None)
+    budget = None
+    if budget_path:
+        with open(budget_path) as f:
+            budget = json.load(f)
+        mismatched = [key for key, value in budget.get("scenario", {}).items() if report["scenario"].get(key) != value]
+        if mismatched and not args.budget:
+            # The default budget only describes the default scenario
+            print(f"\nSkipping {budget_path}: it was set for a different {', '.join(mismatched)}.")
+            budget = None
+    if budget is not None:
+        regressions = check_budget(report, budget)
+        if regressions:
+            print(f"\nBudget regressions against {budget_path}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"Within budget ({budget_path}).")
+    elif report["failures"]:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Only the standard library is imported here, so the probe can run before
+# dependencies, Firefox or any Sheets client are set up.
+
+# Local state shared by all leagues, as in checkpoint.py (not imported to keep this light)
+STATE_DIR = os.getenv('STATE_DIR', '.state')
+SCHEDULE_DIR = os.path.join(STATE_DIR, 'schedule')
+
+# Written by pending_results.py and sheets_outbox.py
+PENDING_FILE = os.path.join(STATE_DIR, 'pending_results.json')
+OUTBOX_FILE = os.path.join(STATE_DIR, 'outbox.sqlite')
+
+# Keep probes fast; on any failure the run goes ahead as usual
+PROBE_TIMEOUT = float(os.getenv('SCHEDULE_PROBE_TIMEOUT', '5'))
+
+# Revalidate a cached season schedule after this many seconds
+SCHEDULE_MAX_AGE = 24 * 60 * 60
+
+MLB_SCHEDULE_URL = "https://statsapi.mlb.com/api/v1/schedule?sportId=1&startDate={start}&endDate={end}&fields=totalGames"
+NBA_SCHEDULE_URL = "https://cdn.nba.com/static/json/staticData/scheduleLeagueV2.json"
+
+# A run writes yesterday's results and the upcoming slate, and the workflows
+# run around midnight Pacific, so look one day either side of the run date.
+WINDOW_DAYS = 1
+
+def _fetch(url, headers=None):
+    """Return (status, headers, body) for a GET, treating 304 as a normal response."""
+    request = urllib.request.Request(url, headers={'User-Agent': 'sports-games-to-sheet', **(headers or {})})
+    try:
+        with urllib.request.urlopen(request, timeout=PROBE_TIMEOUT) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, e.headers, b''
+        raise
+
+def _window(run_date):
+    return [run_date + datetime.timedelta(days=offset) for offset in range(-WINDOW_DAYS, WINDOW_DAYS + 1)]
+
+def mlb_game_count(dates):
+    """Games on the given dates from one small MLB Stats API request."""
+    url = MLB_SCHEDULE_URL.format(start=min(dates).isoformat(), end=max(dates).isoformat())
+    _, _, body = _fetch(url)
+    return json.loads(body).get('totalGames', 0)
+
+def _load_nba_schedule():
+    try:
+        with open(os.path.join(SCHEDULE_DIR, 'nba.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_nba_schedule(cached):
+    os.makedirs(SCHEDULE_DIR, exist_ok=True)
+    path = os.path.join(SCHEDULE_DIR, 'nba.json')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cached, f)
+    os.replace(tmp_path, path)
+
+def nba_games_by_date():
+    """
+    Return {YYYY-MM-DD: game count} for the NBA season.
+
+    The full season schedule is a few MB, so only the per-date counts are
+    cached under SCHEDULE_DIR. The cache is revalidated once a day with
+    If-None-Match, which costs a 304 unless the league changed the schedule.
+    """
+    cached = _load_nba_schedule()
+    if cached and time.time() - cached['checked_at'] < SCHEDULE_MAX_AGE:
+        return cached['games']
+
+    headers = {'If-None-Match': cached['etag']} if cached and cached.get('etag') else {}
+    status, response_headers, body = _fetch(NBA_SCHEDULE_URL, headers)
+    if status == 304:
+        cached['checked_at'] = time.time()
+        _save_nba_schedule(cached)
+        return cached['games']
+
+    games = {}
+    for game_date in json.loads(body)['leagueSchedule']['gameDates']:
+        # "10/21/2025 00:00:00", Eastern time
+        date = datetime.datetime.strptime(game_date['gameDate'].split()[0], '%m/%d/%Y').date()
+        games[date.isoformat()] = games.get(date.isoformat(), 0) + len(game_date.get('games', []))
+    _save_nba_schedule({'etag': response_headers.get('ETag'), 'checked_at': time.time(), 'games': games})
+    return games
+
+def nba_game_count(dates):
+    games = nba_games_by_date()
+    return sum(games.get(date.isoformat(), 0) for date in dates)
+
+PROBES = {"mlb": mlb_game_count, "nba": nba_game_count}
+
+def has_games(league, run_date=None):
+    """
+    Decide whether a league's run has anything to scrape or record.
+
+    Args:
+        league (str): "mlb" or "nba"
+        run_date (datetime.date, optional): Date of the run. Defaults to today.
+
+    Returns:
+        bool: False only when the schedule says there are no games around run_date.
+              Any probe failure returns True so a broken probe never skips a game day.
+    """
+    dates = _window(run_date or datetime.date.today())
+    try:
+        count = PROBES[league](dates)
+    except Exception as e:
+        print(f"Schedule probe for {league.upper()} failed ({e}), running anyway.")
+        return True
+    print(f"{league.upper()} schedule: {count} games between {dates[0]} and {dates[-1]}.")
+    return count > 0
+
+def has_backlog(league):
+    """
+    Whether the cached state still has work that cannot wait for the next game day.
+
+    That is games still without a winner, or Sheets writes waiting in the outbox.
+    Off days, the All-Star break and the offseason still run for these in
+    --replay-only mode. A state file that cannot be read counts as work.
+    """
+    try:
+        with open(PENDING_FILE) as f:
+            if any(not entry.get('resolved') for entry in json.load(f).get(league, [])):
+                return True
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError):
+        return True
+
+    if not os.path.exists(OUTBOX_FILE):
+        return False
+    try:
+        connection = sqlite3.connect(OUTBOX_FILE, timeout=30)
+        try:
+            return connection.execute('SELECT COUNT(*) FROM mutations WHERE acked_at IS NULL').fetchone()[0] > 0
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the schedule before launching a browser.")
+    parser.add_argument("league", choices=sorted(PROBES), help="League to check")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, help="Run date, YYYY-MM-DD (default today)")
+    parser.add_argument("--exit-code", action="store_true", help="Exit 1 on off days, for `probe && run` chaining")
+    args = parser.parse_args()
+
+    games = has_games(args.league, args.date)
+    backlog = not games and has_backlog(args.league)
+    if backlog:
+        print(f"No {args.league.upper()} games, but pending results or queued Sheets updates remain: replay only.")
+    elif not games:
+        print(f"No {args.league.upper()} games to collect or record, skipping the run.")
+    run_mode = "full" if games else "replay-only" if backlog else "skip"
+
+    # GitHub Actions reads step outputs from this file
+    github_output = os.getenv('GITHUB_OUTPUT')
+    if github_output:
+        with open(github_output, 'a') as f:
+            f.write(f"has_games={'true' if games else 'false'}\n")
+            f.write(f"run_mode={run_mode}\n")
+
+    if args.exit_code and not games:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+import json
+import os
+import signal
+import threading
+import time
+from urllib.parse import urlsplit
+
+from selenium.common.exceptions import TimeoutException
+
+from checkpoint import STATE_DIR
+
+# Selenium-side timeouts applied to every driver, in seconds
+PAGE_LOAD_TIMEOUT = float(os.getenv('PAGE_LOAD_TIMEOUT', '30'))
+SCRIPT_TIMEOUT = float(os.getenv('SCRIPT_TIMEOUT', '20'))
+
+# Wall-clock budgets enforced by the supervisor, in seconds
+PAGE_DEADLINE = float(os.getenv('PAGE_DEADLINE', '45'))
+STAGE_DEADLINE = float(os.getenv('STAGE_DEADLINE', '300'))
+MAX_LOAD_ATTEMPTS = 3
+
+# Start a second browser once the primary is slower than this percentile of past loads
+HEDGE_PERCENTILE = 0.9
+HEDGE_MIN_SAMPLES = 5
+HEDGE_DEFAULT_DELAY = 15.0
+LATENCY_HISTORY = 50
+LATENCY_FILE = os.path.join(STATE_DIR, 'page_latency.json')
+
+# Callables notified as listener(stage_name, url, attempt, error) before every load retry
+LOAD_RETRY_LISTENERS = []
+
+class StageDeadlineExceeded(Exception):
+    """Raised when a scraping stage runs past its deadline and its browsers were killed."""
+
+def _descendant_pids(root_pid):
+    """Return the pids of every process below root_pid (Linux /proc only)."""
+    if not os.path.isdir('/proc'):
+        return []
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        ppid = int(stat[stat.rindex(')') + 2:].split()[1])
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids = []
+    pending = list(children.get(root_pid, []))
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+def _latency_key(url):
+    parts = urlsplit(url)
+    return f"{parts.netloc}{parts.path}"
+
+def _load_latencies():
+    try:
+        with open(LATENCY_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _page_usable(driver, ready):
+    """
+    Whether a page whose load timed out already has what the scraper reads.
+
+    Args:
+        driver (webdriver): Driver whose load was stopped
+        ready (tuple, optional): Selenium locator, e.g. (By.XPATH, "..."), that
+                                 must match. Without one the DOM must be parsed.
+    """
+    if ready is not None:
+        return bool(driver.find_elements(*ready))
+    return driver.execute_script("return document.readyState") != "loading"
+
+class _PageLoad(threading.Thread):
+    """Run driver.get(url) off the main thread, creating the driver first if needed."""
+
+    def __init__(self, supervisor, driver, url, finished, ready=None):
+        super().__init__(daemon=True)
+        self.supervisor = supervisor
+        self.driver = driver
+        self.url = url
+        self.ready = ready
+        self.finished = finished
+        self.error = None
+        self.done = False
+
+    def run(self):
+        try:
+            if self.driver is None:
+                self.driver = self.supervisor._new_driver()
+            try:
+                self.driver.get(self.url)
+            except TimeoutException:
+                # Ads and trackers can hold off the load event long after the
+                # games are on the page; stop them and keep the page if so
+                self.driver.execute_script("window.stop();")
+                if not _page_usable(self.driver, self.ready):
+                    raise
+                print(f"{self.supervisor.stage_name}: {self.url} was still loading after "
+                      f"{PAGE_LOAD_TIMEOUT:.0f}s, stopped it with the page already usable.")
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self.finished.set()
+
+class BrowserSupervisor:
+    """
+    Own the browsers for one scraping stage and bound how long they can take.
+
+    Every driver gets Selenium page-load and script timeouts; a page that
+    times out while its content is already there is stopped and kept. Each load() runs
+    under PAGE_DEADLINE, and if the primary browser is slower than the
+    HEDGE_PERCENTILE of past loads of that page a fresh browser is started on
+    the same URL and whichever finishes first is kept. Hung browsers are
+    killed along with their Firefox children and the load is retried. A
+    watchdog kills everything once the whole stage passes its deadline.
+
+    Usage:
+        with BrowserSupervisor(setup_ff_driver, "MLB lineups") as supervisor:
+            driver = supervisor.load(url)
+            ...
+    """
+
+    def __init__(self, driver_factory, stage_name, stage_deadline=STAGE_DEADLINE, hedge=True):
+        """
+        Args:
+            driver_factory (callable): Returns a new webdriver instance
+            stage_name (str): Name used in log messages
+            stage_deadline (float): Seconds before the watchdog kills the stage's browsers
+            hedge (bool): Allow a second browser when the primary load is slow
+        """
+        self.driver_factory = driver_factory
+        self.stage_name = stage_name
+        self.stage_deadline = stage_deadline
+        self.hedge = hedge
+        self.driver = None
+        self.timed_out = False
+        self._lock = threading.Lock()
+        self._in_flight = []
+        self._latencies = _load_latencies()
+        self._watchdog = threading.Timer(stage_deadline, self._on_stage_deadline)
+        self._watchdog.daemon = True
+        self._stage_started = None
+
+    def __enter__(self):
+        self._stage_started = time.perf_counter()
+        self._watchdog.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._watchdog.cancel()
+        self.quit()
+        self._save_latencies()
+        if self.timed_out and exc_type is None:
+            # Anything parsed after the kill is incomplete, so do not return it
+            raise StageDeadlineExceeded(f"{self.stage_name} exceeded its {self.stage_deadline:.0f}s deadline")
+        return False
+
+    def _new_driver(self):
+        driver = self.driver_factory()
+        driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+        driver.set_script_timeout(SCRIPT_TIMEOUT)
+        return driver
+
+    def _kill(self, driver):
+        """Kill geckodriver and the Firefox processes under it without waiting on WebDriver."""
+        if driver is None:
+            return
+        process = getattr(getattr(driver, 'service', None), 'process', None)
+        if process is None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+            return
+        for pid in _descendant_pids(process.pid) + [process.pid]:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def _on_stage_deadline(self):
+        print(f"Watchdog: {self.stage_name} exceeded {self.stage_deadline:.0f}s, killing its browsers.")
+        self.timed_out = True
+        with self._lock:
+            drivers = [self.driver] + [load.driver for load in self._in_flight]
+            self.driver = None
+        for driver in drivers:
+            self._kill(driver)
+
+    def _remaining(self):
+        return self.stage_deadline - (time.perf_counter() - self._stage_started)
+
+    def _hedge_delay(self, url):
+        samples = sorted(self._latencies.get(_latency_key(url), []))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return samples[int(HEDGE_PERCENTILE * (len(samples) - 1))]
+
+    def _record_latency(self, url, seconds):
+        samples = self._latencies.setdefault(_latency_key(url), [])
+        samples.append(round(seconds, 3))
+        del samples[:-LATENCY_HISTORY]
+
+    def _save_latencies(self):
+        # Merge with what other supervisors saved since we loaded
+        merged = _load_latencies()
+        for key, samples in self._latencies.items():
+            merged[key] = samples
+        os.makedirs(os.path.dirname(LATENCY_FILE), exist_ok=True)
+        tmp_path = f"{LATENCY_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(merged, f)
+        os.replace(tmp_path, LATENCY_FILE)
+
+    def _hedged_get(self, url, deadline, ready=None):
+        finished = threading.Event()
+        with self._lock:
+            primary = _PageLoad(self, self.driver, url, finished, ready)
+            self.driver = None
+            self._in_flight = [primary]
+        primary.start()
+
+        started = time.perf_counter()
+        hedge_at = started + self._hedge_delay(url)
+        end = started + deadline
+
+        while not self.timed_out:
+            now = time.perf_counter()
+            if now >= end:
+                break
+            waiting_to_hedge = self.hedge and len(self._in_flight) == 1
+            finished.wait(max((min(end, hedge_at) if waiting_to_hedge else end) - now, 0))
+            finished.clear()
+
+            winner = next((load for load in self._in_flight if load.done and load.error is None), None)
+            if winner is not None:
+                with self._lock:
+                    losers = [load for load in self._in_flight if load is not winner]
+                    self._in_flight = []
+                    self.driver = winner.driver
+                for load in losers:
+                    self._kill(load.driver)
+                self._record_latency(url, time.perf_counter() - started)
+                return winner.driver
+
+            if all(load.done for load in self._in_flight) and not waiting_to_hedge:
+                # Every browser failed outright, no point waiting out the deadline
+                break
+
+            if waiting_to_hedge and (time.perf_counter() >= hedge_at or primary.done):
+                print(f"{self.stage_name}: load of {url} is slow, hedging with a fresh browser.")
+                hedge = _PageLoad(self, None, url, finished, ready)
+                with self._lock:
+                    self._in_flight.append(hedge)
+                hedge.start()
+
+        with self._lock:
+            failed = self._in_flight
+            self._in_flight = []
+        # Collect errors before killing, which makes every pending load fail too
+        errors = [load.error for load in failed if load.error is not None]
+        for load in failed:
+            self._kill(load.driver)
+        if errors:
+            raise errors[0]
+        raise TimeoutError(f"{url} did not load within {deadline:.0f}s")
+
+    def load(self, url, ready=None):
+        """
+        Load url within PAGE_DEADLINE, retrying in a fresh browser on hangs or errors.
+
+        A load that hits PAGE_LOAD_TIMEOUT is stopped and kept, not retried,
+        when the page already matches ready.
+
+        Args:
+            url (str): Page to load
+            ready (tuple, optional): Selenium locator of the elements the scraper reads
+
+        Returns:
+            webdriver: The driver now showing the page
+        """
+        last_error = None
+        for attempt in range(1, MAX_LOAD_ATTEMPTS + 1):
+            remaining = self._remaining()
+            if self.timed_out or remaining <= 0:
+                raise StageDeadlineExceeded(f"{self.stage_name} exceeded its {self.stage_deadline:.0f}s deadline")
+            try:
+                return self._hedged_get(url, min(PAGE_DEADLINE, remaining), ready)
+            except Exception as e:
+                last_error = e
+                print(f"{self.stage_name}: attempt {attempt} to load {url} failed: {e}")
+                if attempt < MAX_LOAD_ATTEMPTS:
+                    for listener in LOAD_RETRY_LISTENERS:
+                        listener(self.stage_name, url, attempt, e)
+        raise last_error
+
+    def quit(self):
+        """Close the current browser, killing it if WebDriver does not respond."""
+        with self._lock:
+            driver = self.driver
+            self.driver = None
+        if driver is None:
+            return
+        closer = threading.Thread(target=driver.quit, daemon=True)
+        closer.start()
+        closer.join(SCRIPT_TIMEOUT)
+        if closer.is_alive():
+            self._kill(driver)
@@ -0,0 +1,409 @@
+import datetime
+import os
+import zlib
+
+from gspread.urls import SPREADSHEET_URL
+
+import sheets_outbox
+from sheets_retry import retry_with_backoff
+
+# How new daily blocks are placed, set per league with SHEET_LAYOUT:
+#   insert   insert cells at A3 and shift the history in A:F down (original behaviour)
+#   append   add each block below the previous one on the same tab
+#   monthly  append to a "<tab> YYYY-MM" tab, starting a new tab every month
+#   season   append to a "<tab> <season>" tab, starting a new tab every season
+LAYOUTS = ("insert", "append", "monthly", "season")
+
+# Rows 1-2 of every tab hold the headers; the first block starts on row 3
+HEADER_ROWS = 2
+FIRST_BLOCK_ROW = HEADER_ROWS + 1
+
+# Month each league's season starts in, for naming season tabs
+SEASON_START_MONTH = {"mlb": 1, "nba": 10, "ufc": 1}
+
+INDEX_HEADER = ["Date", "Tab", "Start Row", "Rows", "Link"]
+
+# Every block's rows carry developer metadata keyed by league and league tab,
+# with the block date as the value, so a block is found where it is now with
+# one developerMetadata.search instead of assuming it still starts at A3. Row
+# metadata moves with whole rows inserted above it; the insert layout only
+# shifts A:F, so prepare_block moves the tags below the new block itself.
+BLOCK_METADATA_KEY = "{league}-block-{base_id}"
+
+# Tags older than this many days before a new block are deleted when it is
+# placed, so every tab keeps a bounded number of tags and placing a block
+# costs the same however long the history is. It covers the pending results
+# window (PENDING_MAX_DAYS in pending_results.py) with a week to spare;
+# older pending rows fall back to the rows tracked by shift_rows.
+BLOCK_TAG_DAYS = int(os.getenv('PENDING_MAX_DAYS', '14')) + 7
+
+@retry_with_backoff()
+def _spreadsheet_batch_update(spreadsheet, requests):
+    """Send structural requests in one spreadsheets.batchUpdate call with retry logic."""
+    return spreadsheet.batch_update({'requests': requests})
+
+@retry_with_backoff()
+def _get_values(worksheet, range_name):
+    return worksheet.get_values(range_name)
+
+@retry_with_backoff()
+def _list_worksheets(spreadsheet):
+    return spreadsheet.worksheets()
+
+@retry_with_backoff()
+def _update_values(worksheet, range_name, values):
+    worksheet.update(values=values, range_name=range_name, value_input_option='USER_ENTERED')
+
+@retry_with_backoff()
+def _search_developer_metadata(spreadsheet, data_filters):
+    response = spreadsheet.client.request(
+        'post', f"{SPREADSHEET_URL % spreadsheet.id}/developerMetadata:search", json={'dataFilters': data_filters},
+    )
+    return response.json().get('matchedDeveloperMetadata', [])
+
+def tab_id(title):
+    """Deterministic sheetId for tabs we create, so they can be set up in the same batch."""
+    return zlib.crc32(title.encode('utf-8')) & 0x7FFFFFFF
+
+def _season_label(league, block_date):
+    year, month = int(block_date[:4]), int(block_date[5:7])
+    start_month = SEASON_START_MONTH.get(league, 1)
+    if start_month == 1:
+        return str(year)
+    start_year = year if month >= start_month else year - 1
+    return f"{start_year}-{(start_year + 1) % 100:02d}"
+
+def block_tab_title(base_title, league, block_date, layout):
+    """Title of the tab a block for block_date goes on under the given layout."""
+    if layout == "monthly":
+        return f"{base_title} {block_date[:7]}"
+    if layout == "season":
+        return f"{base_title} {_season_label(league, block_date)}"
+    return base_title
+
+def _row_range(sheet_id, start_row, num_rows):
+    return {'dimensionRange': {
+        'sheetId': sheet_id, 'dimension': 'ROWS',
+        'startIndex': start_row - 1, 'endIndex': start_row - 1 + num_rows,
+    }}
+
+def tag_block_requests(league, base_worksheet_id, block_sheet_id, block_date, start_row, num_rows):
+    """
+    Requests anchoring a block's rows to its league and date.
+
+    Any earlier tag for the same date is deleted first, so a rewritten date
+    has exactly one tag and the metadata does not grow with reruns.
+    """
+    key = BLOCK_METADATA_KEY.format(league=league, base_id=base_worksheet_id)
+    return [
+        {'deleteDeveloperMetadata': {'dataFilter': {'developerMetadataLookup': {
+            'metadataKey': key, 'metadataValue': block_date,
+        }}}},
+        {'createDeveloperMetadata': {'developerMetadata': {
+            'metadataKey': key,
+            'metadataValue': block_date,
+            'visibility': 'DOCUMENT',
+            'location': _row_range(block_sheet_id, start_row, num_rows),
+        }}},
+    ]
+
+def block_tags(spreadsheet, league, base_worksheet_id, block_dates=None):
+    """
+    Developer metadata of a league tab's tagged blocks, oldest first.
+
+    Fetch these once per sheet and pass them to existing_block and
+    prepare_block, so placing a block needs a single search.
+    """
+    key = BLOCK_METADATA_KEY.format(league=league, base_id=base_worksheet_id)
+    if block_dates is None:
+        lookups = [{'metadataKey': key}]
+    elif not block_dates:
+        return []
+    else:
+        lookups = [{'metadataKey': key, 'metadataValue': date} for date in sorted(set(block_dates))]
+    matches = _search_developer_metadata(spreadsheet, [{'developerMetadataLookup': lookup} for lookup in lookups])
+    return sorted((match['developerMetadata'] for match in matches), key=lambda metadata: metadata['metadataId'])
+
+def find_blocks(spreadsheet, league, base_worksheet_id, block_dates=None):
+    """
+    Locate tagged blocks of a league tab with one developerMetadata.search call.
+
+    Args:
+        spreadsheet (gspread.Spreadsheet): Spreadsheet holding the league tab
+        league (str): League key
+        base_worksheet_id (int): sheetId of the league tab from sheets_info
+        block_dates (list, optional): Dates to look up. Defaults to every tagged block.
+
+    Returns:
+        dict: {YYYY-MM-DD: (sheetId, start_row, num_rows)} with 1-based start rows.
+              Sheets tagged twice for a date before tags were replaced keep the newer one.
+    """
+    return _blocks(block_tags(spreadsheet, league, base_worksheet_id, block_dates))
+
+def _blocks(tags):
+    blocks = {}
+    for metadata in tags:
+        rows = metadata['location']['dimensionRange']
+        blocks[metadata['metadataValue']] = (rows['sheetId'], rows['startIndex'] + 1, rows['endIndex'] - rows['startIndex'])
+    return blocks
+
+def _prune_requests(tags, block_date):
+    """deleteDeveloperMetadata requests for tags more than BLOCK_TAG_DAYS older than block_date."""
+    cutoff = (datetime.date.fromisoformat(block_date) - datetime.timedelta(days=BLOCK_TAG_DAYS)).isoformat()
+    return [{'deleteDeveloperMetadata': {'dataFilter': {'developerMetadataLookup': {'metadataId': metadata['metadataId']}}}}
+            for metadata in tags if metadata['metadataValue'] < cutoff]
+
+def _index_title(base_worksheet):
+    return f"{base_worksheet.title} Index"
+
+def _find_worksheet(worksheets, title):
+    return next((worksheet for worksheet in worksheets if worksheet.title == title), None)
+
+def _ensure_index(spreadsheet, base_worksheet, worksheets):
+    """Return the index tab for base_worksheet, creating it with a header row if needed."""
+    title = _index_title(base_worksheet)
+    index_worksheet = _find_worksheet(worksheets, title)
+    if index_worksheet is None:
+        _spreadsheet_batch_update(spreadsheet, [{
+            'addSheet': {'properties': {
+                'sheetId': tab_id(title), 'title': title,
+                'gridProperties': {'rowCount': 100, 'columnCount': len(INDEX_HEADER), 'frozenRowCount': 1},
+            }}
+        }])
+        index_worksheet = spreadsheet.get_worksheet_by_id(tab_id(title))
+        _update_values(index_worksheet, 'A1:E1', [INDEX_HEADER])
+    return index_worksheet
+
+def _parse_index_row(row):
+    return {'date': row[0], 'tab': row[1], 'start_row': int(row[2]), 'num_rows': int(row[3])}
+
+def _latest_index_entry(index_worksheet):
+    """The index keeps the newest block on row 2, so this is a single small read."""
+    rows = _get_values(index_worksheet, 'A2:D2')
+    if not rows or len(rows[0]) < 4:
+        return None
+    return _parse_index_row(rows[0])
+
+def prepare_block(spreadsheet, base_worksheet, league, block_date, num_rows, num_columns, layout, tags=None):
+    """
+    Make room for a new block of num_rows rows and return where it goes.
+
+    Under the insert layout this inserts cells into A:F at A3 and shifts the
+    history down, leaving column G onwards alone. Cell inserts do not move
+    row metadata, so the same batchUpdate moves every tag on the tab down
+    with it; cells inserted by hand in A:F still leave the tags behind. The
+    other layouts never move existing rows: they find the last tagged block
+    on the target tab and start right below it, on a rotated tab when
+    needed, so the cost of adding a block does not grow with the history.
+    Either way the new block's rows are tagged in the same batchUpdate (see
+    find_blocks and tag_block_requests), and tags older than BLOCK_TAG_DAYS
+    are deleted in it, so the tags moved and searched stay bounded.
+
+    Args:
+        spreadsheet (gspread.Spreadsheet): Spreadsheet holding the league tab
+        base_worksheet (gspread.Worksheet): The league tab from sheets_info
+        league (str): League key, used for season tab names
+        block_date (str): Date written in the block, YYYY-MM-DD
+        num_rows (int): Number of game rows in the block
+        num_columns (int): Number of columns the block spans
+        layout (str): One of LAYOUTS
+        tags (list, optional): The tab's block_tags, if already fetched
+
+    Returns:
+        tuple: (gspread.Worksheet, int) worksheet and 1-based row the block starts on
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown sheet layout '{layout}', expected one of {LAYOUTS}")
+
+    # Queued writes address rows by number, so they must land before rows move
+    sheets_outbox.drain(spreadsheet.client, spreadsheet.id)
+    if tags is None:
+        tags = block_tags(spreadsheet, league, base_worksheet.id)
+    prune = _prune_requests(tags, block_date)
+    pruned = {request['deleteDeveloperMetadata']['dataFilter']['developerMetadataLookup']['metadataId']
+              for request in prune}
+
+    if layout == "insert":
+        requests = [{'insertRange': {
+            'range': {
+                'sheetId': base_worksheet.id,
+                'startRowIndex': FIRST_BLOCK_ROW - 1,
+                'endRowIndex': FIRST_BLOCK_ROW - 1 + num_rows,
+                'startColumnIndex': 0,
+                'endColumnIndex': num_columns,
+            },
+            'shiftDimension': 'ROWS',
+        }}]
+        # Follow the shifted cells with the tags of the blocks below
+        for metadata in tags:
+            rows = metadata['location']['dimensionRange']
+            if (rows['sheetId'] != base_worksheet.id or metadata['metadataValue'] == block_date
+                    or metadata['metadataId'] in pruned):
+                continue
+            if rows['startIndex'] >= FIRST_BLOCK_ROW - 1:
+                requests.append({'updateDeveloperMetadata': {
+                    'dataFilters': [{'developerMetadataLookup': {'metadataId': metadata['metadataId']}}],
+                    'developerMetadata': {'location': _row_range(
+                        base_worksheet.id, rows['startIndex'] + 1 + num_rows, rows['endIndex'] - rows['startIndex'])},
+                    'fields': 'location',
+                }})
+        requests += prune
+        requests += tag_block_requests(league, base_worksheet.id, base_worksheet.id, block_date, FIRST_BLOCK_ROW, num_rows)
+        _spreadsheet_batch_update(spreadsheet, requests)
+        print(f"Inserted cells and shifted down on sheet {base_worksheet.id} from A{FIRST_BLOCK_ROW} spanning {num_rows} rows and {num_columns} columns.")
+        return base_worksheet, FIRST_BLOCK_ROW
+
+    worksheets = _list_worksheets(spreadsheet)
+    index_worksheet = _ensure_index(spreadsheet, base_worksheet, worksheets)
+    target_title = block_tab_title(base_worksheet.title, league, block_date, layout)
+    target = _find_worksheet(worksheets, target_title)
+    requests = []
+
+    if target is None:
+        # New rotated tab: copy the header rows from the league tab
+        target_id = tab_id(target_title)
+        requests.append({'addSheet': {'properties': {
+            'sheetId': target_id, 'title': target_title,
+            'gridProperties': {'rowCount': 1000, 'columnCount': base_worksheet.col_count, 'frozenRowCount': HEADER_ROWS},
+        }}})
+        requests.append({'copyPaste': {
+            'source': {'sheetId': base_worksheet.id, 'startRowIndex': 0, 'endRowIndex': HEADER_ROWS},
+            'destination': {'sheetId': target_id, 'startRowIndex': 0, 'endRowIndex': HEADER_ROWS},
+            'pasteType': 'PASTE_NORMAL',
+        }})
+        start_row = FIRST_BLOCK_ROW
+        row_count = 1000
+    else:
+        block_ends = [start + rows for sheet_id, start, rows in _blocks(tags).values() if sheet_id == target.id]
+        latest = _latest_index_entry(index_worksheet) if not block_ends else None
+        if block_ends:
+            start_row = max(block_ends)
+        elif latest is not None and latest['tab'] == target_title:
+            # Blocks written before they were tagged
+            start_row = latest['start_row'] + latest['num_rows']
+        else:
+            # First appended block on an existing tab: find its end once
+            start_row = max(len(_get_values(target, f"A:{chr(ord('A') + num_columns - 1)}")) + 1, FIRST_BLOCK_ROW)
+        row_count = target.row_count
+
+    target_id = target.id if target is not None else tab_id(target_title)
+    needed_rows = start_row + num_rows - 1
+    if needed_rows > row_count:
+        requests.append({'appendDimension': {
+            'sheetId': target_id,
+            'dimension': 'ROWS',
+            'length': needed_rows - row_count + 500,
+        }})
+    requests += prune
+    requests += tag_block_requests(league, base_worksheet.id, target_id, block_date, start_row, num_rows)
+
+    _spreadsheet_batch_update(spreadsheet, requests)
+    if target is None:
+        target = spreadsheet.get_worksheet_by_id(tab_id(target_title))
+
+    print(f"Placed {num_rows}-row block on '{target.title}' at A{start_row} ({layout} layout).")
+    return target, start_row
+
+def existing_block(spreadsheet, base_worksheet, league, block_date, num_rows, tags=None):
+    """
+    Find a block already placed for block_date, e.g. by an attempt that failed
+    after placing it, so a rerun writes into it instead of placing another.
+
+    Only a tagged block with the same number of rows is reused; a different
+    game count means the slate changed and a new block is placed. tags are
+    the tab's block_tags, if already fetched.
+
+    Returns:
+        tuple: (gspread.Worksheet, int) worksheet and 1-based start row, or (None, None)
+    """
+    if tags is None:
+        tags = block_tags(spreadsheet, league, base_worksheet.id, [block_date])
+    block = _blocks(tag for tag in tags if tag['metadataValue'] == block_date).get(block_date)
+    if block is None:
+        return None, None
+    sheet_id, start_row, rows = block
+    if rows != num_rows:
+        print(f"The {rows}-row block already placed for {block_date} does not fit {num_rows} games, placing a new one.")
+        return None, None
+    if sheet_id == base_worksheet.id:
+        block_worksheet = base_worksheet
+    else:
+        block_worksheet = next((worksheet for worksheet in _list_worksheets(spreadsheet) if worksheet.id == sheet_id), None)
+        if block_worksheet is None:
+            return None, None
+    print(f"Reusing the block placed for {block_date} on '{block_worksheet.title}' at A{start_row}.")
+    return block_worksheet, start_row
+
+def record_block(spreadsheet, base_worksheet, block_worksheet, block_date, start_row, num_rows, layout):
+    """
+    Add a block to the index tab, newest first, with a link to jump to it.
+
+    The index is the lightweight "latest first" view for appended and
+    rotated layouts. The insert layout needs no index. A block that is
+    already the newest entry is not added again, so reruns are safe.
+    """
+    if layout == "insert":
+        return
+    worksheets = _list_worksheets(spreadsheet)
+    index_worksheet = _ensure_index(spreadsheet, base_worksheet, worksheets)
+    latest = _latest_index_entry(index_worksheet)
+    if latest == {'date': block_date, 'tab': block_worksheet.title, 'start_row': start_row, 'num_rows': num_rows}:
+        return
+    _spreadsheet_batch_update(spreadsheet, [{
+        'insertDimension': {
+            'range': {'sheetId': index_worksheet.id, 'dimension': 'ROWS', 'startIndex': 1, 'endIndex': 2},
+            'inheritFromBefore': False,
+        }
+    }])
+    link = f'=HYPERLINK("#gid={block_worksheet.id}&range=A{start_row}", "Open")'
+    _update_values(index_worksheet, 'A2:E2', [[block_date, block_worksheet.title, start_row, num_rows, link]])
+
+def locate_block(spreadsheet, base_worksheet, league, layout, block_date=None):
+    """
+    Find where a block was written.
+
+    Tagged blocks are found by their metadata wherever rows above them were
+    inserted or moved; sheets without tags fall back to the fixed A3 position
+    (insert layout) or the index tab.
+
+    Args:
+        spreadsheet (gspread.Spreadsheet): Spreadsheet holding the league tab
+        base_worksheet (gspread.Worksheet): The league tab from sheets_info
+        league (str): League key
+        layout (str): One of LAYOUTS
+        block_date (str, optional): YYYY-MM-DD of the block. Defaults to the newest block.
+
+    Returns:
+        tuple: (gspread.Worksheet, int) worksheet and 1-based start row, or (None, None) if not found
+    """
+    blocks = find_blocks(spreadsheet, league, base_worksheet.id, None if block_date is None else [block_date])
+    if blocks:
+        sheet_id, start_row, _ = blocks[block_date or max(blocks)]
+        if sheet_id == base_worksheet.id:
+            return base_worksheet, start_row
+        block_worksheet = next((worksheet for worksheet in _list_worksheets(spreadsheet) if worksheet.id == sheet_id), None)
+        return (block_worksheet, start_row) if block_worksheet is not None else (None, None)
+
+    if layout == "insert":
+        # Only the newest block has a fixed position
+        if block_date is None:
+            return base_worksheet, FIRST_BLOCK_ROW
+        return None, None
+
+    worksheets = _list_worksheets(spreadsheet)
+    index_worksheet = _find_worksheet(worksheets, _index_title(base_worksheet))
+    if index_worksheet is None:
+        return None, None
+
+    if block_date is None:
+        entry = _latest_index_entry(index_worksheet)
+    else:
+        entries = [_parse_index_row(row) for row in _get_values(index_worksheet, 'A2:D') if len(row) >= 4]
+        entry = next((entry for entry in entries if entry['date'] == block_date), None)
+    if entry is None:
+        return None, None
+
+    block_worksheet = _find_worksheet(worksheets, entry['tab'])
+    if block_worksheet is None:
+        return None, None
+    return block_worksheet, entry['start_row']
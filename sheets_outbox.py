@@ -0,0 +1,297 @@
+import argparse
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from checkpoint import STATE_DIR
+from sheets_retry import retry_with_backoff
+
+# Sheets writes are committed here before they are sent, so data scraped
+# during a quota exhaustion or outage survives the process and is sent by a
+# later run. Kept under STATE_DIR, which the workflows cache between runs.
+OUTBOX_FILE = os.path.join(STATE_DIR, 'outbox.sqlite')
+
+# Seconds the background flusher waits after being woken, so writes queued
+# close together go out as one request
+OUTBOX_LINGER = float(os.getenv('OUTBOX_LINGER', '0.5'))
+
+# Acknowledged entries are kept this long for inspection, then deleted
+OUTBOX_KEEP_DAYS = 7
+
+# Sheet module for each league, as in live_results.py
+LEAGUE_SHEETS = {"mlb": "mlb_gcp", "nba": "gcp_test", "ufc": "ufc_gcp"}
+
+# kind is 'values' (data for values.batchUpdate) or 'requests' (requests for
+# spreadsheets.batchUpdate); payload is the JSON list of either
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS mutations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    spreadsheet_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    acked_at REAL
+)
+"""
+
+# Entries are sent in order by one thread at a time
+_send_lock = threading.Lock()
+_flushers = []
+
+def _connect():
+    os.makedirs(os.path.dirname(OUTBOX_FILE), exist_ok=True)
+    connection = sqlite3.connect(OUTBOX_FILE, timeout=30)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=FULL')
+    connection.execute(SCHEMA)
+    return connection
+
+def _enqueue(spreadsheet_id, kind, payload):
+    if not payload:
+        return None
+    connection = _connect()
+    try:
+        with connection:
+            cursor = connection.execute(
+                'INSERT INTO mutations (spreadsheet_id, kind, payload, created_at) VALUES (?, ?, ?, ?)',
+                (spreadsheet_id, kind, json.dumps(payload), time.time()),
+            )
+    finally:
+        connection.close()
+    for flusher in list(_flushers):
+        flusher.notify()
+    return cursor.lastrowid
+
+def enqueue_values(spreadsheet_id, data):
+    """
+    Queue cell writes for one values.batchUpdate.
+
+    Args:
+        spreadsheet_id (str): Spreadsheet ID
+        data (list): [{'range': "'Tab'!B5", 'values': [[...]]}, ...] with the tab in every range
+    """
+    return _enqueue(spreadsheet_id, 'values', data)
+
+def enqueue_requests(spreadsheet_id, requests):
+    """Queue requests for one spreadsheets.batchUpdate; they are always sent together, in order."""
+    return _enqueue(spreadsheet_id, 'requests', requests)
+
+def outstanding(spreadsheet_id=None):
+    """Entries not yet acknowledged, oldest first, as (id, spreadsheet_id, kind, payload) tuples."""
+    connection = _connect()
+    try:
+        query = 'SELECT id, spreadsheet_id, kind, payload FROM mutations WHERE acked_at IS NULL'
+        params = ()
+        if spreadsheet_id is not None:
+            query += ' AND spreadsheet_id = ?'
+            params = (spreadsheet_id,)
+        rows = connection.execute(query + ' ORDER BY id', params).fetchall()
+    finally:
+        connection.close()
+    return [(row_id, sheet_id, kind, json.loads(payload)) for row_id, sheet_id, kind, payload in rows]
+
+def coalesce(entries):
+    """
+    Merge consecutive entries of the same kind into one batch each.
+
+    Only neighbours are merged, so a structural change queued between two
+    groups of cell writes still happens between them. Within a values batch
+    a later write to the same range replaces the earlier one.
+
+    Returns:
+        list: (ids, kind, payload) per batch, in send order
+    """
+    batches = []
+    for row_id, _, kind, payload in entries:
+        if batches and batches[-1][1] == kind:
+            batches[-1][0].append(row_id)
+            batches[-1][2].extend(payload)
+        else:
+            batches.append(([row_id], kind, list(payload)))
+
+    for ids, kind, payload in batches:
+        if kind == 'values':
+            latest = {data['range']: index for index, data in enumerate(payload)}
+            payload[:] = [data for index, data in enumerate(payload) if latest[data['range']] == index]
+    return batches
+
+@retry_with_backoff()
+def _send(http_client, spreadsheet_id, kind, payload):
+    if kind == 'values':
+        return http_client.values_batch_update(spreadsheet_id, {'valueInputOption': 'USER_ENTERED', 'data': payload})
+    return http_client.batch_update(spreadsheet_id, {'requests': payload})
+
+def _mark(ids, error=None):
+    connection = _connect()
+    placeholders = ','.join('?' * len(ids))
+    try:
+        with connection:
+            if error is None:
+                connection.execute(f'UPDATE mutations SET acked_at = ? WHERE id IN ({placeholders})', (time.time(), *ids))
+            else:
+                connection.execute(
+                    f'UPDATE mutations SET attempts = attempts + 1, last_error = ? WHERE id IN ({placeholders})',
+                    (str(error), *ids),
+                )
+    finally:
+        connection.close()
+
+def flush(client, spreadsheet_id=None):
+    """
+    Send outstanding entries in coalesced batches and acknowledge them.
+
+    A batch that still fails after retry_with_backoff stays queued along
+    with everything after it for the same spreadsheet, so writes are never
+    applied out of order. Other spreadsheets carry on.
+
+    Args:
+        client (gspread.Client or gspread.HTTPClient): Client to send with
+        spreadsheet_id (str, optional): Only flush this spreadsheet
+
+    Returns:
+        int: Entries still outstanding for the flushed spreadsheet(s)
+    """
+    http_client = getattr(client, 'http_client', client)
+    with _send_lock:
+        entries = outstanding(spreadsheet_id)
+        by_spreadsheet = {}
+        for entry in entries:
+            by_spreadsheet.setdefault(entry[1], []).append(entry)
+
+        remaining = 0
+        for sheet_id, sheet_entries in by_spreadsheet.items():
+            batches = coalesce(sheet_entries)
+            for position, (ids, kind, payload) in enumerate(batches):
+                try:
+                    _send(http_client, sheet_id, kind, payload)
+                except Exception as e:
+                    _mark(ids, e)
+                    kept = sum(len(batch[0]) for batch in batches[position:])
+                    remaining += kept
+                    print(f"Kept {kept} queued Sheets updates for {sheet_id} in the outbox: {e}")
+                    break
+                _mark(ids)
+    return remaining
+
+def drain(client, spreadsheet_id):
+    """
+    Send everything queued for a spreadsheet before reading it or moving its rows.
+
+    Raises:
+        RuntimeError: If queued updates could not be sent
+    """
+    remaining = flush(client, spreadsheet_id)
+    if remaining:
+        raise RuntimeError(f"{remaining} queued Sheets updates for {spreadsheet_id} could not be sent")
+
+def prune(keep_days=OUTBOX_KEEP_DAYS):
+    """Delete acknowledged entries older than keep_days."""
+    connection = _connect()
+    try:
+        with connection:
+            connection.execute('DELETE FROM mutations WHERE acked_at IS NOT NULL AND acked_at < ?',
+                               (time.time() - keep_days * 24 * 60 * 60,))
+    finally:
+        connection.close()
+
+class OutboxFlusher:
+    """
+    Send queued writes from a background thread while the run carries on.
+
+    Entering replays anything left over from earlier runs; leaving sends
+    whatever is still queued. Entries that cannot be sent stay in the outbox
+    for the next run. Only the given spreadsheets are flushed: the outbox is
+    shared by every league, and each league's client can only write its own.
+
+    Usage:
+        with OutboxFlusher(client, sheet_ids) as flusher:
+            pipeline.run()
+        if flusher.remaining:
+            ...
+    """
+
+    def __init__(self, client, spreadsheet_ids, linger=OUTBOX_LINGER):
+        """
+        Args:
+            client (gspread.Client): Authorized gspread client
+            spreadsheet_ids (list): Spreadsheets this client writes to
+            linger (float): Seconds to wait after a write is queued before sending
+        """
+        self.client = client
+        self.spreadsheet_ids = list(spreadsheet_ids)
+        self.linger = linger
+        self.remaining = 0
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='outbox-flusher', daemon=True)
+
+    def notify(self):
+        self._wake.set()
+
+    def _flush(self):
+        return sum(flush(self.client, spreadsheet_id) for spreadsheet_id in self.spreadsheet_ids)
+
+    def _run(self):
+        # Checked after every flush too, since a stop during the linger is cleared with the wake-up
+        while not self._stopping:
+            self._wake.wait()
+            if self._stopping:
+                return
+            time.sleep(self.linger)
+            self._wake.clear()
+            try:
+                self._flush()
+            except Exception as e:
+                print(f"Outbox flush failed: {e}")
+
+    def __enter__(self):
+        prune()
+        _flushers.append(self)
+        self._thread.start()
+        leftover = sum(len(outstanding(spreadsheet_id)) for spreadsheet_id in self.spreadsheet_ids)
+        if leftover:
+            print(f"Replaying {leftover} Sheets updates left in the outbox by an earlier run.")
+            self.notify()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _flushers.remove(self)
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self.remaining = self._flush()
+        if self.remaining:
+            print(f"{self.remaining} Sheets updates are still in the outbox; the next run will send them.")
+        return False
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or send Sheets updates waiting in the outbox.")
+    parser.add_argument("command", choices=["status", "flush"])
+    parser.add_argument("league", nargs="?", choices=sorted(LEAGUE_SHEETS),
+                        help="League whose credentials flush with (required for flush)")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        entries = outstanding()
+        counts = {}
+        for _, sheet_id, kind, _ in entries:
+            counts[(sheet_id, kind)] = counts.get((sheet_id, kind), 0) + 1
+        print(f"{len(entries)} Sheets updates outstanding in {OUTBOX_FILE}.")
+        for (sheet_id, kind), count in sorted(counts.items()):
+            print(f"  {sheet_id}: {count} {kind}")
+        return
+
+    if args.league is None:
+        parser.error("flush needs a league")
+    sheets = importlib.import_module(LEAGUE_SHEETS[args.league])
+    sheet_ids = [sheet_info["sheet_id"] for sheet_info in getattr(sheets, 'sheets_info', [])] or [sheets.sheet_id]
+    remaining = sum(flush(sheets.client, sheet_id) for sheet_id in sheet_ids)
+    print(f"Outbox flushed for {args.league.upper()}, {remaining} updates still outstanding.")
+
+if __name__ == "__main__":
+    main()
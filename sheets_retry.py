@@ -0,0 +1,48 @@
+import os
+import random
+import time
+from functools import wraps
+
+# Default first backoff delay in seconds
+RETRY_INITIAL_DELAY = float(os.getenv('RETRY_INITIAL_DELAY', '5'))
+
+# Callables notified as listener(func_name, attempt, error) before every retry
+RETRY_LISTENERS = []
+
+def retry_with_backoff(max_retries=5, initial_delay=None):
+    """
+    Decorator that implements retry logic with exponential backoff for API calls.
+    
+    Args:
+        max_retries (int): Maximum number of retry attempts
+        initial_delay (int): Initial delay in seconds before first retry. Defaults to RETRY_INITIAL_DELAY.
+        
+    Returns:
+        function: Decorated function with retry logic
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            delay = initial_delay if initial_delay is not None else RETRY_INITIAL_DELAY
+            for attempt in range(max_retries):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    # Check if we've reached max retries
+                    if attempt == max_retries - 1:
+                        print(f"Failed after {max_retries} attempts: {str(e)}")
+                        raise
+                    
+                    for listener in RETRY_LISTENERS:
+                        listener(func.__name__, attempt + 1, e)
+
+                    jitter = random.uniform(0, 1)
+                    wait_time = delay + jitter
+                    
+                    print(f"Attempt {attempt + 1} failed with error: {str(e)}. Retrying in {wait_time:.2f} seconds...")
+                    time.sleep(wait_time)
+                    
+                    # Exponential backoff - double the delay for next attempt
+                    delay *= 2
+        return wrapper
+    return decorator
@@ -0,0 +1,144 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from profiling import profile_thread
+
+# Stages allowed to run at once (each scrape holds a browser, each write a Sheets connection)
+STAGE_WORKERS = int(os.getenv('STAGE_WORKERS', '4'))
+
+class StagePipeline:
+    """
+    Run a league's checkpointed stages as a dependency graph instead of a fixed sequence.
+
+    A stage starts as soon as the stages it depends on have finished, so
+    independent scrapes run side by side and each write starts the moment
+    its input is ready. Outputs of `needs` dependencies are passed to the
+    stage as extra positional arguments; `after` dependencies only order
+    stages (e.g. results before a new block shifts the rows). A failed stage
+    blocks only its dependents; the first error is raised once everything
+    else has finished, and the checkpoints let a rerun resume from there.
+
+    Usage:
+        pipeline = StagePipeline(checkpoint)
+        pipeline.add("scrape_results", update_game_results)
+        pipeline.add("write_results-Personal", update_game_results_in_sheets, [sheet_info],
+                     needs=["scrape_results"])
+        pipeline.run()
+    """
+
+    def __init__(self, checkpoint, max_workers=STAGE_WORKERS):
+        """
+        Args:
+            checkpoint (RunCheckpoint): Checkpoint every stage runs through
+            max_workers (int): Stages allowed to run at once
+        """
+        self.checkpoint = checkpoint
+        self.max_workers = max_workers
+        self.stages = {}
+        self.outputs = {}
+        self.spans = {}
+        self.wall_seconds = 0.0
+        self._started = None
+
+    def add(self, name, func, *args, needs=(), after=()):
+        """
+        Add a stage; its dependencies must already have been added.
+
+        Args:
+            name (str): Stage name, also its checkpoint name
+            func (callable): Called as func(*args, *outputs of needs)
+            needs (list): Stages whose outputs func takes
+            after (list): Stages that must finish first but whose outputs are not passed
+        """
+        for dependency in (*needs, *after):
+            if dependency not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dependency}'")
+        self.stages[name] = {'func': func, 'args': args, 'needs': tuple(needs), 'after': tuple(after)}
+
+    def _run_stage(self, name, func, *args):
+        start = time.perf_counter() - self._started
+        try:
+            # Stages run on pool threads, which the run's cProfile does not see
+            with profile_thread():
+                return self.checkpoint.run_stage(name, func, *args)
+        finally:
+            self.spans[name] = (start, time.perf_counter() - self._started)
+
+    def run(self):
+        """
+        Run every stage, then print the stage timeline and critical path.
+
+        Returns:
+            dict: Output of every stage by name
+        """
+        self._started = time.perf_counter()
+        pending = dict(self.stages)
+        running = {}
+        errors = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    dependencies = stage['needs'] + stage['after']
+                    blocked_by = next((dependency for dependency in dependencies if dependency in errors), None)
+                    if blocked_by is not None:
+                        print(f"Skipping stage '{name}' because '{blocked_by}' did not complete.")
+                        errors[name] = None
+                        del pending[name]
+                    elif all(dependency in self.outputs for dependency in dependencies):
+                        del pending[name]
+                        inputs = [self.outputs[dependency] for dependency in stage['needs']]
+                        future = pool.submit(self._run_stage, name, stage['func'], *stage['args'], *inputs)
+                        running[future] = name
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.outputs[name] = future.result()
+                    except Exception as e:
+                        print(f"Stage '{name}' failed: {e}")
+                        errors[name] = e
+
+        self.wall_seconds = time.perf_counter() - self._started
+        self.print_timings()
+
+        first_error = next((error for error in errors.values() if error is not None), None)
+        if first_error is not None:
+            raise first_error
+        return self.outputs
+
+    def critical_path(self):
+        """
+        The chain of stages that determined the total wall time, first stage first.
+
+        Walks back from the last stage to finish, each time through the
+        dependency that finished last.
+        """
+        if not self.spans:
+            return []
+        name = max(self.spans, key=lambda stage: self.spans[stage][1])
+        path = [name]
+        while True:
+            stage = self.stages[name]
+            finished = [dependency for dependency in stage['needs'] + stage['after'] if dependency in self.spans]
+            if not finished:
+                break
+            name = max(finished, key=lambda dependency: self.spans[dependency][1])
+            path.append(name)
+        return path[::-1]
+
+    def print_timings(self):
+        """Print each stage's start/end offsets with the critical path marked."""
+        path = self.critical_path()
+        print(f"{self.checkpoint.league.upper()} stage timeline (* = critical path):")
+        for name, (start, end) in sorted(self.spans.items(), key=lambda item: item[1]):
+            marker = '*' if name in path else ' '
+            print(f"  {marker} {name:<32} {start:7.2f}s -> {end:7.2f}s ({end - start:.2f}s)")
+        if path:
+            busy = sum(end - start for start, end in self.spans.values())
+            print(f"Critical path: {' -> '.join(path)} "
+                  f"({self.wall_seconds:.2f}s wall, {busy:.2f}s of stage time)")
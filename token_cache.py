@@ -0,0 +1,90 @@
+import datetime
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+
+from google.oauth2.service_account import Credentials
+
+try:
+    import fcntl
+except ImportError:  # Windows, fall back to unlocked access
+    fcntl = None
+
+# Shared across processes and leagues, so it lives outside the repo checkout
+TOKEN_CACHE_DIR = os.getenv(
+    'TOKEN_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'sports-games-to-sheet'),
+)
+
+# Refresh this long before the token actually expires
+REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+def _utcnow():
+    """Naive UTC now, matching the expiry format google-auth uses."""
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+@contextmanager
+def _file_lock(lock_path):
+    """Hold an exclusive lock on lock_path for the duration of the block."""
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def _read_cached_token(cache_path):
+    """Return (token, expiry) from the cache file, or (None, None) if missing or unreadable."""
+    try:
+        with open(cache_path) as f:
+            data = json.load(f)
+        return data['token'], datetime.datetime.fromisoformat(data['expiry'])
+    except (OSError, ValueError, KeyError):
+        return None, None
+
+def _write_cached_token(cache_path, token, expiry):
+    """Atomically replace the cache file so readers never see a partial write."""
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'token': token, 'expiry': expiry.isoformat()}, f)
+    os.replace(tmp_path, cache_path)
+
+class CachedCredentials(Credentials):
+    """
+    Service account credentials that share their access token through a locked file.
+
+    Every gspread client built from these credentials in this process reuses the same token, and sibling processes
+    (other leagues, retries) pick it up from the cache file instead of doing
+    their own token exchange. Tokens are refreshed REFRESH_MARGIN before expiry.
+    """
+
+    def _token_cache_path(self):
+        key = f"{self.service_account_email}|{' '.join(sorted(self._scopes or []))}"
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(TOKEN_CACHE_DIR, f"token-{digest}.json")
+
+    @property
+    def expired(self):
+        if not self.expiry:
+            return False
+        return _utcnow() >= self.expiry - REFRESH_MARGIN
+
+    def refresh(self, request):
+        cache_path = self._token_cache_path()
+
+        with _file_lock(f"{cache_path}.lock"):
+            # Another process may have refreshed while we waited for the lock
+            token, expiry = _read_cached_token(cache_path)
+            if token and expiry - _utcnow() > REFRESH_MARGIN:
+                self.token = token
+                self.expiry = expiry
+                return
+
+            super().refresh(request)
+            _write_cached_token(cache_path, self.token, self.expiry)
+            print(f"Refreshed access token for {self.service_account_email}, valid until {self.expiry:%H:%M:%S} UTC.")
@@ -0,0 +1,295 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+import urllib.error
+import urllib.request
+from html.parser import HTMLParser
+
+# Only the standard library is imported here, as in schedule_probe.py, so the
+# nightly check can run before dependencies or Firefox are set up.
+
+# Local state shared by all leagues, as in checkpoint.py (not imported to keep this light)
+STATE_DIR = os.getenv('STATE_DIR', '.state')
+INDEX_FILE = os.path.join(STATE_DIR, 'ufc', 'events.json')
+# Written by sheets_outbox.py; read here with sqlite3 directly
+OUTBOX_FILE = os.path.join(STATE_DIR, 'outbox.sqlite')
+
+# Upcoming UFC events on the same site the fight list scraper reads
+UFC_EVENTS_URL = os.getenv('UFC_EVENTS_URL', 'https://www.tapology.com/fightcenter?group=ufc&schedule=upcoming')
+FETCH_TIMEOUT = float(os.getenv('UFC_EVENTS_TIMEOUT', '15'))
+
+# Event pages look like /fightcenter/events/123456-ufc-fight-night-...
+EVENT_PATH = re.compile(r'^(?:https?://[^/]+)?(/fightcenter/events/\d+[-\w]*)')
+
+# Countdowns ("in 3 days", "5 hours") change every day without the card
+# changing, so they are left out of an event's hash
+COUNTDOWN = re.compile(r'\b(?:in\s+)?\d+\s*(?:days?|hours?|hrs?|minutes?|mins?)\b|\b(?:today|tomorrow)\b', re.IGNORECASE)
+
+MONTHS = {name: number for number, names in enumerate(
+    [("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",), ("jun", "june"),
+     ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"), ("nov", "november"),
+     ("dec", "december")], start=1) for name in names}
+NAMED_DATE = re.compile(r'\b(' + '|'.join(sorted(MONTHS, key=len, reverse=True)) + r')\.?\s+(\d{1,2})(?:st|nd|rd|th)?(?:,?\s+(\d{4}))?\b',
+                        re.IGNORECASE)
+DOTTED_DATE = re.compile(r'\b(\d{1,2})\.(\d{1,2})\.(\d{4})\b')
+ISO_DATE = re.compile(r'\b(\d{4})-(\d{2})-(\d{2})\b')
+
+class _ListingParser(HTMLParser):
+    """
+    Split the listing into one text segment per event.
+
+    A segment runs from an event's first link to the next event's first
+    link, which covers the title, date, venue and bouts the listing shows
+    for it whatever the surrounding markup is.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+        self._seen = set()
+        self._in_link = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+        match = EVENT_PATH.match(dict(attrs).get('href') or '')
+        if match is None:
+            return
+        path = match.group(1)
+        if path not in self._seen:
+            self._seen.add(path)
+            self.events.append({'path': path, 'name': '', 'text': []})
+        self._in_link = path
+
+    def handle_endtag(self, tag):
+        if tag == 'a':
+            self._in_link = None
+
+    def handle_data(self, data):
+        if not self.events:
+            return
+        text = ' '.join(data.split())
+        if not text:
+            return
+        if self._in_link is not None:
+            event = next(event for event in self.events if event['path'] == self._in_link)
+            if not event['name']:
+                event['name'] = text
+        self.events[-1]['text'].append(text)
+
+def _parse_date(text, today):
+    """First date in text; a date without a year is the next one on or after today."""
+    match = ISO_DATE.search(text)
+    if match:
+        return datetime.date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+    match = DOTTED_DATE.search(text)
+    if match:
+        return datetime.date(int(match.group(3)), int(match.group(1)), int(match.group(2)))
+    match = NAMED_DATE.search(text)
+    if match:
+        month, day = MONTHS[match.group(1).lower()], int(match.group(2))
+        if match.group(3):
+            return datetime.date(int(match.group(3)), month, day)
+        candidate = datetime.date(today.year, month, day)
+        return candidate if candidate >= today else datetime.date(today.year + 1, month, day)
+    return None
+
+def parse_listing(page, base_url=UFC_EVENTS_URL, today=None):
+    """
+    Turn the events listing into upcoming events, in listed order.
+
+    Returns:
+        list: {'url', 'name', 'date' (YYYY-MM-DD or None), 'hash'} per event
+    """
+    today = today or datetime.date.today()
+    parser = _ListingParser()
+    parser.feed(page)
+    origin = re.match(r'^https?://[^/]+', base_url).group(0)
+
+    events = []
+    for event in parser.events:
+        text = ' '.join(event['text'])
+        date = _parse_date(text, today)
+        events.append({
+            'url': origin + event['path'],
+            'name': event['name'] or event['path'].rsplit('/', 1)[-1],
+            'date': date.isoformat() if date else None,
+            'hash': hashlib.sha256(' '.join(COUNTDOWN.sub(' ', text).split()).encode('utf-8')).hexdigest()[:16],
+        })
+    return events
+
+def load_index():
+    try:
+        with open(INDEX_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'events': [], 'fights': {}, 'written': {}}
+
+def save_index(index):
+    os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+    tmp_path = f"{INDEX_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, INDEX_FILE)
+
+def _fetch(url, headers):
+    """Return (status, headers, body) for a GET, treating 304 as a normal response."""
+    request = urllib.request.Request(url, headers={'User-Agent': 'Mozilla/5.0 (sports-games-to-sheet)', **headers})
+    try:
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        if e.code == 304:
+            return 304, e.headers, b''
+        raise
+
+def refresh_index(today=None):
+    """
+    Fetch the events listing once and update the cached index.
+
+    The request is conditional (ETag / Last-Modified) when the site
+    supports it. Cached fight lists are kept only for events still listed.
+
+    Returns:
+        dict: The index: {'events': [...], 'fights': {url: {'hash', 'fights'}}, 'written': {url: hash}}
+    """
+    today = today or datetime.date.today()
+    index = load_index()
+    headers = {}
+    if index.get('etag'):
+        headers['If-None-Match'] = index['etag']
+    if index.get('last_modified'):
+        headers['If-Modified-Since'] = index['last_modified']
+
+    status, response_headers, body = _fetch(UFC_EVENTS_URL, headers)
+    if status != 304:
+        index['events'] = parse_listing(body.decode('utf-8', errors='replace'), UFC_EVENTS_URL, today)
+        index['etag'] = response_headers.get('ETag')
+        index['last_modified'] = response_headers.get('Last-Modified')
+    index['checked_at'] = time.time()
+
+    listed = {event['url'] for event in index['events']}
+    index['fights'] = {url: cached for url, cached in index.get('fights', {}).items() if url in listed}
+    index['written'] = {url: card for url, card in index.get('written', {}).items() if url in listed}
+    save_index(index)
+    print(f"UFC listing: {len(index['events'])} upcoming events"
+          f"{' (unchanged)' if status == 304 else ''}.")
+    return index
+
+def next_event(index, today=None):
+    """The first listed event on or after today; events without a readable date count as upcoming."""
+    today = (today or datetime.date.today()).isoformat()
+    return next((event for event in index['events'] if event['date'] is None or event['date'] >= today), None)
+
+def card_changed(index, event):
+    """Whether the event's fight list has to be (re)scraped."""
+    cached = index['fights'].get(event['url'])
+    return cached is None or cached['hash'] != event['hash']
+
+def event_fights(index, event, scrape):
+    """
+    Fight list for an event, scraped only when its listing hash changed.
+
+    Args:
+        index (dict): Index from refresh_index
+        event (dict): Event from next_event
+        scrape (callable): scrape(event_url) -> list of fights, e.g. collect_ufc_fight_data
+
+    Returns:
+        list: Fights as returned by scrape
+    """
+    if not card_changed(index, event):
+        print(f"UFC card for {event['name']} unchanged, using the cached fight list.")
+        return index['fights'][event['url']]['fights']
+
+    reason = "new event" if event['url'] not in index['fights'] else "card changed"
+    print(f"Fetching the UFC fight list for {event['name']} ({reason}).")
+    fights = scrape(event['url'])
+    index['fights'][event['url']] = {'hash': event['hash'], 'fights': fights, 'fetched_at': time.time()}
+    save_index(index)
+    return fights
+
+def outbox_pending(spreadsheet_id=None):
+    """Number of Sheets writes still waiting in the outbox, for one spreadsheet or all of them."""
+    if not os.path.exists(OUTBOX_FILE):
+        return 0
+    connection = sqlite3.connect(OUTBOX_FILE, timeout=30)
+    try:
+        query = 'SELECT COUNT(*) FROM mutations WHERE acked_at IS NULL'
+        if spreadsheet_id:
+            return connection.execute(f'{query} AND spreadsheet_id = ?', (spreadsheet_id,)).fetchone()[0]
+        return connection.execute(query).fetchone()[0]
+    finally:
+        connection.close()
+
+def needs_run(index, event, today=None, spreadsheet_id=None):
+    """
+    A run has work when the card must be fetched, the event is today and not
+    written yet, or an earlier run left UFC writes in the outbox.
+    """
+    if outbox_pending(spreadsheet_id):
+        return True
+    if event is None:
+        return False
+    today = (today or datetime.date.today()).isoformat()
+    return card_changed(index, event) or (event['date'] == today and event['url'] not in index['written'])
+
+def mark_queued(index, event):
+    """Record that an event's block is in the outbox, so a rerun does not queue it again."""
+    index.setdefault('queued', {})[event['url']] = event['hash']
+    save_index(index)
+
+def mark_written(index, event):
+    index['written'][event['url']] = event['hash']
+    index.get('queued', {}).pop(event['url'], None)
+    save_index(index)
+
+def settle_queued(index):
+    """Mark every queued event written, once the outbox has sent its block."""
+    queued = index.pop('queued', {})
+    if queued:
+        index['written'].update(queued)
+        save_index(index)
+    return list(queued)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the UFC events listing before launching a browser.")
+    parser.add_argument("--date", type=datetime.date.fromisoformat, help="Run date, YYYY-MM-DD (default today)")
+    parser.add_argument("--exit-code", action="store_true", help="Exit 1 when there is nothing to do")
+    args = parser.parse_args()
+
+    today = args.date or datetime.date.today()
+    try:
+        index = refresh_index(today)
+        event = next_event(index, today)
+        # SHEET_ID narrows the outbox check when the UFC sheet shares the state directory
+        work = needs_run(index, event, today, os.getenv('SHEET_ID'))
+        if event is None:
+            print("No upcoming UFC event in the listing.")
+        else:
+            print(f"Next UFC event: {event['name']} on {event['date'] or 'an unknown date'} ({event['url']}).")
+    except Exception as e:
+        # As in schedule_probe.py, a broken check never skips a run
+        print(f"UFC events check failed ({e}), running anyway.")
+        work = True
+
+    if not work:
+        print("UFC card unchanged, no event today and nothing in the outbox, skipping the run.")
+
+    # GitHub Actions reads step outputs from this file
+    github_output = os.getenv('GITHUB_OUTPUT')
+    if github_output:
+        with open(github_output, 'a') as f:
+            f.write(f"has_work={'true' if work else 'false'}\n")
+
+    if args.exit_code and not work:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
+import argparse
 import datetime
-import gspread
 import os
 from dotenv import load_dotenv
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
+from token_cache import CachedCredentials
+from http_transport import gspread_client, print_transport_stats
 
+import sheets_outbox
+import ufc_events
 from ufc_scraper import collect_ufc_fight_data
+from profiling import profile_run
+from sheets_retry import retry_with_backoff
 
 # OAuth2 scope
 scopes = ['https://www.googleapis.com/auth/spreadsheets']
@@ -17,22 +21,27 @@ worksheet_gid = os.getenv('WORKSHEET_GID')
 json_credentials = os.getenv('JSON_CREDENTIALS')
 
 # Load service account from JSON credentials
-credentials = Credentials.from_service_account_file(json_credentials, scopes=scopes)
-client = gspread.authorize(credentials)
+credentials = CachedCredentials.from_service_account_file(json_credentials, scopes=scopes)
+client = gspread_client(credentials)
 
-# Open the spreadsheet by its specified ID
-sheet = client.open_by_key(sheet_id)
+@retry_with_backoff()
+def _get_worksheet():
+    return client.open_by_key(sheet_id).get_worksheet_by_id(int(worksheet_gid))
 
-worksheet = sheet.get_worksheet_by_id(int(worksheet_gid))
-if worksheet is None:
-    raise ValueError(f"No worksheet found with GID: {worksheet_gid}")
+def open_worksheet():
+    """
+    Open the UFC tab. Only done on days the sheet is written, so nightly
+    checks that find nothing new make no Sheets calls.
+    """
+    worksheet = _get_worksheet()
+    if worksheet is None:
+        raise ValueError(f"No worksheet found with GID: {worksheet_gid}")
+    return worksheet
 
 def create_outer_border(sheet_id, worksheet_gid, start_cell, num_rows, num_columns):
     """
-    Creates an outer border around the specified range in Google Sheets.
+    Queues an outer border around the specified range in Google Sheets.
     """
-    service = build('sheets', 'v4', credentials=credentials)
-
     start_column = ord(start_cell[0].upper()) - ord('A')
     start_row = int(start_cell[1:]) - 1
 
@@ -52,18 +61,15 @@ def create_outer_border(sheet_id, worksheet_gid, start_cell, num_rows, num_colum
         }
     }]
 
-    body = {'requests': requests}
-    service.spreadsheets().batchUpdate(spreadsheetId=sheet_id, body=body).execute()
+    sheets_outbox.enqueue_requests(sheet_id, requests)
 
-    print(f"Outer border created from {start_cell} spanning {num_rows} rows and {num_columns} columns.")
+    print(f"Outer border queued from {start_cell} spanning {num_rows} rows and {num_columns} columns.")
 
 
 def insert_cells_and_shift_down(sheet_id, worksheet_gid, start_cell, num_rows, num_columns):
     """
-    Inserts empty cells and shifts the range down in Google Sheets.
+    Queues inserting empty cells and shifting the range down in Google Sheets.
     """
-    service = build('sheets', 'v4', credentials=credentials)
-
     start_column = ord(start_cell[0].upper()) - ord('A')
     start_row = int(start_cell[1:]) - 1
 
@@ -80,33 +86,101 @@ def insert_cells_and_shift_down(sheet_id, worksheet_gid, start_cell, num_rows, n
         }
     }]
 
-    body = {'requests': requests}
-    service.spreadsheets().batchUpdate(spreadsheetId=sheet_id, body=body).execute()
+    sheets_outbox.enqueue_requests(sheet_id, requests)
 
-    print(f"Inserted cells and shifted down from {start_cell} spanning {num_rows} rows and {num_columns} columns.")
+    print(f"Queued inserting cells and shifting down from {start_cell} spanning {num_rows} rows and {num_columns} columns.")
 
 
 def update_todays_ufc_fights_in_sheet(worksheet, start_cell, fights_data):
     today_date = datetime.datetime.now().strftime('%Y-%m-%d')
-    worksheet.update_acell(start_cell, today_date)
+    data = [{'range': f"'{worksheet.title}'!{start_cell}", 'values': [[today_date]]}]
 
-    # Update cells with UFC fight data
+    # Queue cells with UFC fight data
     for fight in fights_data:
         row_number = fight["fight_index"] + 2
-        worksheet.update(values=[[fight["fighter_1"]]], range_name=f'B{row_number}')
-        worksheet.update(values=[[fight["fighter_2"]]], range_name=f'C{row_number}')
+        data.append({'range': f"'{worksheet.title}'!B{row_number}:C{row_number}",
+                     'values': [[fight["fighter_1"], fight["fighter_2"]]]})
+    sheets_outbox.enqueue_values(sheet_id, data)
 
-if __name__ == "__main__":
-    todays_fights = collect_ufc_fight_data()
+def next_event_fights():
+    """
+    Pick the next event from the events index and return (event, fights) if
+    it is today and not written yet, otherwise (event, None).
+
+    The fight list is scraped only when the event's listing entry changed
+    since the last run, so the browser is not started on most nights.
+    """
+    today = datetime.datetime.now().date()
+    index = ufc_events.refresh_index(today)
+    event = ufc_events.next_event(index, today)
+    if event is None:
+        print("No upcoming UFC event in the listing. Skipping the sheet update.")
+        return None, None
+
+    fights = ufc_events.event_fights(index, event, collect_ufc_fight_data)
+    if event['date'] is None:
+        print(f"Could not read the date of {event['name']} from the listing; set UFC_URL to write it by hand.")
+        return event, None
+    if event['date'] != today.isoformat():
+        print(f"Next UFC event {event['name']} is on {event['date']}. Skipping the sheet update.")
+        return event, None
+    if event['url'] in index['written']:
+        print(f"{event['name']} was already written to the sheet. Skipping the sheet update.")
+        return event, None
+    if event['url'] in index.get('queued', {}):
+        print(f"{event['name']} is already queued in the outbox. Skipping the sheet update.")
+        return event, None
+    return event, fights
+
+def replay_outbox():
+    """
+    Send UFC writes an earlier run left in the outbox, and mark their events
+    written once all of them are through. Makes no Sheets calls when the
+    outbox is empty.
+    """
+    remaining = sheets_outbox.flush(client, sheet_id)
+    if remaining:
+        raise RuntimeError(f"{remaining} Sheets updates are waiting in the outbox")
+    for url in ufc_events.settle_queued(ufc_events.load_index()):
+        print(f"Queued UFC block for {url} is now in the sheet.")
+
+def main():
+    # A UFC_URL set by hand picks the event, as before the events index
+    if os.getenv("UFC_URL"):
+        event, todays_fights = None, collect_ufc_fight_data()
+    else:
+        event, todays_fights = next_event_fights()
+        if todays_fights is None:
+            # No new card, but an earlier night's block may still be queued
+            replay_outbox()
+            return
+    worksheet = open_worksheet()
 
     # Define the start range dimensions
     start_cell = "A3"
     num_rows = len(todays_fights)
     num_columns = 6
 
-    # Update the Google Sheet
+    # Queue the whole block in the outbox first, so a Sheets error cannot lose
+    # the scraped fights; a later run sends whatever is left, oldest first
     insert_cells_and_shift_down(sheet_id, worksheet_gid, start_cell, num_rows, num_columns)
     create_outer_border(sheet_id, worksheet_gid, start_cell, num_rows, num_columns)
     update_todays_ufc_fights_in_sheet(worksheet, start_cell, todays_fights)
+    if event is not None:
+        ufc_events.mark_queued(ufc_events.load_index(), event)
+
+    remaining = sheets_outbox.flush(client, sheet_id)
+    if remaining:
+        raise RuntimeError(f"{remaining} Sheets updates are waiting in the outbox")
+    if event is not None:
+        ufc_events.mark_written(ufc_events.load_index(), event)
+    print("Updated UFC fights in the Google Sheet!")
+    print_transport_stats()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update UFC fights in Google Sheets.")
+    parser.add_argument("--profile", action="store_true", help="Write CPU, memory and browser RSS profiles to PROFILE_DIR")
+    args = parser.parse_args()
 
-    print("Updated UFC fights in the Google Sheet!")
\ No newline at end of file
+    with profile_run("ufc", enabled=args.profile):
+        main()
@@ -5,20 +5,30 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
 
+from scrape_supervisor import BrowserSupervisor
+
 load_dotenv(".ufc.env")
 
-def collect_ufc_fight_data():
-    driver = webdriver.Firefox()
-    try:
-        ufc_url = os.getenv("UFC_URL")
-        if not ufc_url:
-            raise ValueError("UFC_URL not found in the environment variables.")
+# Fights on an event page
+FIGHT_LIST_SELECTOR = "ul.mt-5[data-event-view-toggle-target='list'] li.border-b.border-dotted.border-tap_6"
+
+def collect_ufc_fight_data(ufc_url=None):
+    """
+    Scrape the fight list of one event page.
 
-        driver.get(ufc_url)
+    Args:
+        ufc_url (str, optional): Event page; defaults to UFC_URL from the environment
+    """
+    ufc_url = ufc_url or os.getenv("UFC_URL")
+    if not ufc_url:
+        raise ValueError("UFC_URL not found in the environment variables.")
+
+    with BrowserSupervisor(webdriver.Firefox, "UFC fights") as supervisor:
+        driver = supervisor.load(ufc_url, ready=(By.CSS_SELECTOR, FIGHT_LIST_SELECTOR))
         time.sleep(2)
 
         # Locate the list of fights
-        fight_list = driver.find_elements(By.CSS_SELECTOR, "ul.mt-5[data-event-view-toggle-target='list'] li.border-b.border-dotted.border-tap_6")
+        fight_list = driver.find_elements(By.CSS_SELECTOR, FIGHT_LIST_SELECTOR)
         print(f"Found {len(fight_list)} fights.")
 
         fights_data = []
@@ -47,9 +57,6 @@ def collect_ufc_fight_data():
 
         return fights_data
 
-    finally:
-        driver.quit()
-
 if __name__ == "__main__":
     ufc_fights = collect_ufc_fight_data()
 